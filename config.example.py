@@ -10,16 +10,22 @@ TELEGRAM_BOT_TOKEN = "your_bot_token_here"
 TELEGRAM_CHAT_ID = "your_chat_id_here"
 
 # API роуты для опроса нод
-# Список эндпоинтов которые будут опрашиваться у каждой ноды
+# Список эндпоинтов которые будут опрашиваться у каждой ноды при запуске
+# lib/poll_all_nodes.py напрямую. run.py сам определяет нужные роуты
+# по плейсхолдерам шаблона TEMPLATE_PATH
 API_ROUTES = [
     '/api/sno',
     # '/api/sno/satellites',
     '/api/sno/estimated-payout'
 ]
 
-# Путь к шаблону SVG
+# Путь к шаблону SVG или к папке пакета шаблонов (SVG + manifest.json)
 TEMPLATE_PATH = "templates/default/index.svg"
 
+# Варианты пакета для рендера и отправки (описаны в manifest.json пакета),
+# например ["default", "compact"]. По умолчанию - вариант TEMPLATE_PATH
+# TEMPLATE_VARIANTS = ["default"]
+
 # Путь к файлу со списком нод
 # Формат: одна нода на строку, формат host:port
 # Пример:
@@ -28,3 +34,49 @@ TEMPLATE_PATH = "templates/default/index.svg"
 #   [2001:db8::1]:14002
 NODES_FILE = "nodes.txt"
 
+
+# Circuit breaker для хронически недоступных нод
+# После CIRCUIT_FAILURE_THRESHOLD подряд неудачных опросов нода проверяется
+# только одним быстрым запросом с таймаутом CIRCUIT_PROBE_TIMEOUT секунд,
+# пока снова не ответит. Состояние хранится в CIRCUIT_STATE_FILE
+CIRCUIT_FAILURE_THRESHOLD = 3
+CIRCUIT_PROBE_TIMEOUT = 3
+CIRCUIT_STATE_FILE = "circuit_state.json"
+
+# История показателей по дням для графиков на карточке
+# HISTORY_FILE - файл истории, CHART_DAYS - сколько последних дней показывать
+HISTORY_FILE = "history.json"
+CHART_DAYS = 30
+
+# Итоги заработка по месяцам и годам (прошлый месяц, с начала года, held)
+# пополняются при каждом опросе из ответов нод на /api/sno/estimated-payout
+ROLLUP_FILE = "rollups.json"
+
+# Опрос данных по каждому спутнику (/api/sno/satellite/<id>) для таблицы по спутникам
+# Добавляет по одному запросу на каждую пару нода × спутник. Таблица - отдельный
+# вариант пакета шаблонов: TEMPLATE_VARIANTS = ["default", "satellites"]
+# По умолчанию включается сам, если в выбранных вариантах есть плейсхолдеры
+# секции Satellite; True/False включает или выключает опрос явно
+# POLL_PER_SATELLITE = False
+
+# Алерты по результатам опроса (отправляются отдельным сообщением)
+# Типы: disk_usage (threshold - доля заполнения диска),
+#       trash_spike (factor - во сколько раз вырос trash, min_bytes - минимальный прирост),
+#       zero_ingress (нет ingress за прошлый день, нужен /api/sno/satellites в шаблоне),
+#       earnings_drop (threshold - доля падения ожидаемого заработка за месяц)
+# Если ALERT_RULES не задан, используются правила DEFAULT_ALERT_RULES из lib/alerts.py.
+# ALERT_RULES = [] отключает алерты, свой список задается так:
+# ALERT_RULES = [
+#     {'type': 'disk_usage', 'threshold': 0.9},
+#     {'type': 'zero_ingress'},
+# ]
+ALERT_STATE_FILE = "alert_state.json"
+
+# Экспорт метрик Prometheus (режим ./run.py serve)
+# Ноды опрашиваются раз в METRICS_POLL_INTERVAL секунд, /metrics отдает последний snapshot
+METRICS_HOST = "0.0.0.0"
+METRICS_PORT = 9651
+METRICS_POLL_INTERVAL = 300
+# Опрашиваются роуты /api/sno, /api/sno/estimated-payout и /api/sno/satellites (не API_ROUTES).
+# Состояние circuit breaker - отдельное от report, чтобы частые опросы не влияли на отчет
+METRICS_CIRCUIT_STATE_FILE = "circuit_state_serve.json"
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Агрегация ответов нод: статистика по роутам и суммирование данных по флоту.
+
+Модуль не делает сетевых запросов и не читает config, поэтому его используют
+и опрос (poll_all_nodes), и воспроизведение snapshot без сети.
+"""
+
+# Роут с данными по одному спутнику: /api/sno/satellite/<id>.
+# В агрегированных данных матрица спутник × метрика лежит под этим же ключом
+SATELLITE_ROUTE = '/api/sno/satellite'
+
+def count_route_results(route_stats, failed_route_stats, node_results, routes):
+    """Добавляет ответы одной ноды к статистике успешных и неудачных запросов по роутам
+    
+    Запросы /api/sno/satellite/<id> считаются по каждому спутнику отдельно:
+    неудачные не попадают в таблицу по спутникам, и по этой статистике видно, сколько их было.
+    """
+    satellite_prefix = SATELLITE_ROUTE + '/'
+    node_routes = list(routes) + [route for route in node_results if route.startswith(satellite_prefix)]
+    for route in node_routes:
+        if node_results.get(route, {}).get('status') == 'success':
+            route_stats[route] = route_stats.get(route, 0) + 1
+        else:
+            failed_route_stats[route] = failed_route_stats.get(route, 0) + 1
+
+def is_node_successful(node_results, routes):
+    """Проверяет, что нода успешно отдала все роуты"""
+    for route in routes:
+        if node_results.get(route, {}).get('status') != 'success':
+            return False
+    return True
+
+def aggregate_data(successful_nodes, routes, per_satellite=False):
+    """Агрегирует данные от всех успешно ответивших нод"""
+    
+    # Инициализируем структуру для агрегированных данных
+    aggregated = {}
+    
+    for route in routes:
+        aggregated[route] = {
+            'status': 'success',
+            'status_code': 200,
+            'data': None
+        }
+    
+    # Агрегируем данные по каждому роуту
+    for route in routes:
+        route_data_list = []
+        
+        for node, node_results in successful_nodes.items():
+            route_result = node_results.get(route)
+            if route_result and route_result.get('status') == 'success':
+                route_data = route_result.get('data')
+                if route_data:
+                    route_data_list.append(route_data)
+        
+        if not route_data_list:
+            # Если нет успешных ответов по этому роуту, возвращаем None
+            aggregated[route]['data'] = None
+            continue
+        
+        aggregated[route]['data'] = aggregate_route_data(route, route_data_list)
+    
+    if per_satellite:
+        aggregated[SATELLITE_ROUTE] = {
+            'status': 'success',
+            'status_code': 200,
+            'data': aggregate_per_satellite_data(successful_nodes) or None
+        }
+    
+    return aggregated
+
+def aggregate_route_data(route, data_list):
+    """Агрегирует список ответов одного роута в зависимости от роута"""
+    if route == '/api/sno':
+        return aggregate_sno_data(data_list)
+    elif route == '/api/sno/estimated-payout':
+        return aggregate_payout_data(data_list)
+    elif route == '/api/sno/satellites':
+        return aggregate_satellites_data(data_list)
+    return None
+
+def merge_aggregated_data(parts, routes, per_satellite=False):
+    """Объединяет несколько результатов aggregate_data (например, посчитанных по частям нод)
+    
+    Агрегаты имеют ту же структуру, что и ответы нод, поэтому повторно
+    прогоняются через те же функции агрегации.
+    """
+    merged = {}
+    
+    for route in routes:
+        data_list = [part[route]['data'] for part in parts if part.get(route, {}).get('data')]
+        merged[route] = {
+            'status': 'success',
+            'status_code': 200,
+            'data': aggregate_route_data(route, data_list) if data_list else None
+        }
+    
+    if per_satellite:
+        matrix = {}
+        for part in parts:
+            merge_satellite_matrices(matrix, part.get(SATELLITE_ROUTE, {}).get('data') or {})
+        merged[SATELLITE_ROUTE] = {
+            'status': 'success',
+            'status_code': 200,
+            'data': matrix or None
+        }
+    
+    return merged
+
+def aggregate_sno_data(data_list):
+    """Агрегирует данные из /api/sno"""
+    aggregated = {
+        'diskSpace': {
+            'used': 0,
+            'trash': 0
+        }
+    }
+    
+    for data in data_list:
+        if 'diskSpace' in data:
+            disk_space = data['diskSpace']
+            if 'used' in disk_space:
+                aggregated['diskSpace']['used'] += disk_space['used']
+            if 'trash' in disk_space:
+                aggregated['diskSpace']['trash'] += disk_space['trash']
+    
+    return aggregated
+
+def aggregate_payout_data(data_list):
+    """Агрегирует данные из /api/sno/estimated-payout"""
+    aggregated = {
+        'currentMonth': {
+            'payout': 0,
+            'held': 0,
+            'diskSpacePayout': 0,
+            'egressBandwidthPayout': 0,
+            'egressRepairAuditPayout': 0
+        },
+        'currentMonthExpectations': 0
+    }
+    
+    for data in data_list:
+        if 'currentMonth' in data:
+            current_month = data['currentMonth']
+            if 'payout' in current_month:
+                aggregated['currentMonth']['payout'] += current_month['payout']
+            if 'held' in current_month:
+                aggregated['currentMonth']['held'] += current_month['held']
+            if 'diskSpacePayout' in current_month:
+                aggregated['currentMonth']['diskSpacePayout'] += current_month['diskSpacePayout']
+            if 'egressBandwidthPayout' in current_month:
+                aggregated['currentMonth']['egressBandwidthPayout'] += current_month['egressBandwidthPayout']
+            if 'egressRepairAuditPayout' in current_month:
+                aggregated['currentMonth']['egressRepairAuditPayout'] += current_month['egressRepairAuditPayout']
+        
+        if 'currentMonthExpectations' in data:
+            aggregated['currentMonthExpectations'] += data['currentMonthExpectations']
+    
+    return aggregated
+
+def aggregate_satellites_data(data_list):
+    """Агрегирует данные из /api/sno/satellites"""
+    aggregated = {
+        'ingressSummary': 0,
+        'egressSummary': 0,
+        'bandwidthDaily': [],
+        'bandwidthByDay': {}
+    }
+    
+    # Суммируем ingressSummary и egressSummary
+    for data in data_list:
+        if 'ingressSummary' in data:
+            aggregated['ingressSummary'] += data['ingressSummary']
+        if 'egressSummary' in data:
+            aggregated['egressSummary'] += data['egressSummary']
+    
+    # Суммируем ВСЕ дни из bandwidthDaily для получения данных за все время
+    all_time_aggregated = {
+        'ingress': {
+            'usage': 0,
+            'repair': 0
+        },
+        'egress': {
+            'usage': 0,
+            'repair': 0,
+            'audit': 0
+        }
+    }
+    
+    # Параллельно сохраняем разбивку по дням (для графиков на карточке):
+    # {"2024-01-05": {"ingress": байты, "egress": байты}}
+    by_day = aggregated['bandwidthByDay']
+    
+    for data in data_list:
+        if 'bandwidthDaily' in data and isinstance(data['bandwidthDaily'], list):
+            bandwidth_daily = data['bandwidthDaily']
+            # Суммируем все дни, а не только последний
+            for day in bandwidth_daily:
+                day_key = str(day.get('intervalStart') or '')[:10]
+                if day_key:
+                    day_totals = by_day.setdefault(day_key, {'ingress': 0, 'egress': 0})
+                    for value in day.get('ingress', {}).values():
+                        day_totals['ingress'] += value
+                    for value in day.get('egress', {}).values():
+                        day_totals['egress'] += value
+                
+                if 'ingress' in day:
+                    ingress = day['ingress']
+                    if 'usage' in ingress:
+                        all_time_aggregated['ingress']['usage'] += ingress['usage']
+                    if 'repair' in ingress:
+                        all_time_aggregated['ingress']['repair'] += ingress['repair']
+                
+                if 'egress' in day:
+                    egress = day['egress']
+                    if 'usage' in egress:
+                        all_time_aggregated['egress']['usage'] += egress['usage']
+                    if 'repair' in egress:
+                        all_time_aggregated['egress']['repair'] += egress['repair']
+                    if 'audit' in egress:
+                        all_time_aggregated['egress']['audit'] += egress['audit']
+        
+        # Уже агрегированные данные (при объединении частей) несут разбивку по дням с собой
+        for day_key, day in (data.get('bandwidthByDay') or {}).items():
+            day_totals = by_day.setdefault(day_key, {'ingress': 0, 'egress': 0})
+            day_totals['ingress'] += day.get('ingress', 0)
+            day_totals['egress'] += day.get('egress', 0)
+    
+    # Создаем один элемент bandwidthDaily с агрегированными данными за все время
+    aggregated['bandwidthDaily'] = [all_time_aggregated]
+    
+    return aggregated
+
+def aggregate_per_satellite_data(successful_nodes):
+    """Агрегирует ответы /api/sno/satellite/<id> всех нод в матрицу спутник × метрика
+    
+    Все пары (нода, спутник) сливаются за один проход. Оценки хранятся суммой
+    вместе с количеством нод, чтобы матрицы можно было складывать между собой.
+    
+    Returns:
+        dict: {satellite_id: {'name', 'nodes', 'failed', 'stored', 'ingress', 'egress',
+                              'auditScoreSum', 'onlineScoreSum'}}
+        failed - сколько нод не отдали данные по спутнику
+    """
+    prefix = SATELLITE_ROUTE + '/'
+    matrix = {}
+    
+    for node_results in successful_nodes.values():
+        # Имена спутников (host без порта) есть только в /api/sno
+        names = {}
+        sno_data = node_results.get('/api/sno', {}).get('data') or {}
+        for satellite in sno_data.get('satellites') or []:
+            names[satellite.get('id')] = str(satellite.get('url') or '').split(':')[0]
+        
+        for route, route_result in node_results.items():
+            if not route.startswith(prefix):
+                continue
+            
+            satellite_id = route[len(prefix):]
+            data = route_result.get('data') if route_result.get('status') == 'success' else None
+            audits = (data or {}).get('audits') or {}
+            row = matrix.setdefault(satellite_id, {
+                'name': names.get(satellite_id) or audits.get('satelliteName') or satellite_id,
+                'nodes': 0,
+                'failed': 0,
+                'stored': 0,
+                'ingress': 0,
+                'egress': 0,
+                'auditScoreSum': 0,
+                'onlineScoreSum': 0
+            })
+            if not data:
+                # Нода не отдала данные по спутнику: в суммы не входит, но учитывается
+                row['failed'] += 1
+                continue
+            if row['name'] == satellite_id and audits.get('satelliteName'):
+                row['name'] = audits['satelliteName']
+            
+            row['nodes'] += 1
+            row['stored'] += data.get('currentStorageUsed', 0) or 0
+            row['ingress'] += data.get('ingressSummary', 0) or 0
+            row['egress'] += data.get('egressSummary', 0) or 0
+            row['auditScoreSum'] += audits.get('auditScore', 0) or 0
+            row['onlineScoreSum'] += audits.get('onlineScore', 0) or 0
+    
+    return matrix
+
+def merge_satellite_matrices(target, matrix):
+    """Добавляет матрицу спутник × метрика к target (все метрики, кроме имени, суммируются)"""
+    for satellite_id, row in matrix.items():
+        target_row = target.get(satellite_id)
+        if target_row is None:
+            target[satellite_id] = dict(row)
+            continue
+        for key, value in row.items():
+            if key != 'name':
+                target_row[key] = target_row.get(key, 0) + value
+    return target
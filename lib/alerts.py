@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Алерты по результатам опроса нод.
+
+Правила описываются в config.ALERT_RULES списком словарей, например:
+    {'type': 'disk_usage', 'threshold': 0.9}
+
+и один раз компилируются в функции rule(node_results, baseline) -> текст или None.
+Каждое правило проверяется на результате ноды сразу, как только нода ответила.
+На ноду хранится только небольшой словарь baseline с прошлыми значениями.
+
+Состояние хранится в JSON файле между запусками:
+    {"baselines": {"host:port": {"trash": 123, ...}},
+     "active": {"disk_usage:host:port": "2024-01-05T08:00:00"}}
+
+active - уже отправленные алерты: повторно они не отправляются, пока
+условие не пропадет.
+"""
+import json
+import os
+from datetime import datetime, timezone
+
+# Правила по умолчанию, если ALERT_RULES не задан в config.py
+DEFAULT_ALERT_RULES = [
+    {'type': 'disk_usage', 'threshold': 0.95},
+    {'type': 'trash_spike', 'factor': 2.0, 'min_bytes': 10 * 1000 ** 3},
+    {'type': 'zero_ingress'},
+    {'type': 'earnings_drop', 'threshold': 0.2},
+]
+
+def rule_disk_usage(threshold=0.95):
+    """Диск (used + trash) заполнен больше чем на threshold от выделенного места"""
+    def rule(node_results, baseline):
+        disk_space = (node_results.get('/api/sno', {}).get('data') or {}).get('diskSpace') or {}
+        available = disk_space.get('available', 0)
+        if available <= 0:
+            return None
+        usage = (disk_space.get('used', 0) + disk_space.get('trash', 0)) / available
+        if usage > threshold:
+            return f"диск заполнен на {usage * 100:.1f}%"
+        return None
+    return rule
+
+def rule_trash_spike(factor=2.0, min_bytes=10 * 1000 ** 3):
+    """Trash вырос в factor раз с прошлого опроса (и не меньше чем на min_bytes)"""
+    def rule(node_results, baseline):
+        disk_space = (node_results.get('/api/sno', {}).get('data') or {}).get('diskSpace')
+        if not disk_space or 'trash' not in disk_space:
+            return None
+        trash = disk_space['trash']
+        previous = baseline.get('trash')
+        baseline['trash'] = trash
+        if previous is None:
+            return None
+        if trash > previous * factor and trash - previous >= min_bytes:
+            return f"trash вырос с {previous / 1000 ** 3:.1f} до {trash / 1000 ** 3:.1f} GB"
+        return None
+    return rule
+
+def rule_zero_ingress():
+    """Нулевой ingress за последний полный день"""
+    def rule(node_results, baseline):
+        satellites_data = node_results.get('/api/sno/satellites', {}).get('data') or {}
+        bandwidth_daily = satellites_data.get('bandwidthDaily') or []
+        # Последний элемент - текущий (неполный) день
+        if len(bandwidth_daily) < 2:
+            return None
+        last_full_day = bandwidth_daily[-2]
+        ingress = sum((last_full_day.get('ingress') or {}).values())
+        if ingress == 0:
+            day = str(last_full_day.get('intervalStart') or '')[:10]
+            return f"нет ingress за {day}" if day else "нет ingress за прошлый день"
+        return None
+    return rule
+
+def rule_earnings_drop(threshold=0.2):
+    """Ожидаемый заработок за месяц упал больше чем на threshold с прошлого опроса"""
+    def rule(node_results, baseline):
+        payout_data = node_results.get('/api/sno/estimated-payout', {}).get('data')
+        if not payout_data or 'currentMonthExpectations' not in payout_data:
+            return None
+        expected = payout_data['currentMonthExpectations']
+        # Месяц по UTC: currentMonthExpectations ноды обнуляется в начале UTC месяца
+        month = datetime.now(timezone.utc).strftime('%Y-%m')
+        previous = baseline.get('expectations') if baseline.get('month') == month else None
+        baseline['expectations'] = expected
+        baseline['month'] = month
+        if not previous or previous <= 0:
+            return None
+        drop = (previous - expected) / previous
+        if drop > threshold:
+            return f"ожидаемый заработок упал на {drop * 100:.0f}% (${previous / 100:.2f} → ${expected / 100:.2f})"
+        return None
+    return rule
+
+RULE_TYPES = {
+    'disk_usage': rule_disk_usage,
+    'trash_spike': rule_trash_spike,
+    'zero_ingress': rule_zero_ingress,
+    'earnings_drop': rule_earnings_drop,
+}
+
+def compile_rules(rule_configs):
+    """Компилирует описания правил в список (имя, функция)"""
+    compiled = []
+    for rule_config in rule_configs:
+        params = dict(rule_config)
+        rule_type = params.pop('type', None)
+        if rule_type not in RULE_TYPES:
+            raise ValueError(f"неизвестный тип алерта: {rule_type}")
+        compiled.append((rule_type, RULE_TYPES[rule_type](**params)))
+    return compiled
+
+def load_alert_state(state_file):
+    """Читает состояние алертов из файла"""
+    state = {}
+    if os.path.exists(state_file):
+        try:
+            with open(state_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"✗ Не удалось прочитать состояние алертов {state_file}: {e}")
+    if not isinstance(state, dict):
+        state = {}
+    state.setdefault('baselines', {})
+    state.setdefault('active', {})
+    return state
+
+def save_alert_state(state_file, state):
+    """Сохраняет состояние алертов в файл"""
+    try:
+        with open(state_file, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=2, ensure_ascii=False)
+        return True
+    except OSError as e:
+        print(f"✗ Не удалось сохранить состояние алертов {state_file}: {e}")
+        return False
+
+def evaluate_node(compiled_rules, state, node, node_results, fired):
+    """Проверяет все правила на результате одной ноды, сработавшие добавляет в fired"""
+    baseline = state['baselines'].setdefault(node, {})
+    for rule_name, rule in compiled_rules:
+        message = rule(node_results, baseline)
+        if message:
+            fired[f"{rule_name}:{node}"] = f"{node}: {message}"
+
+def collect_new_alerts(state, fired, evaluated_nodes):
+    """Возвращает тексты только новых алертов и обновляет список активных
+
+    Алерты проверенных нод, которые больше не срабатывают, считаются решенными.
+    """
+    active = state['active']
+    for key in list(active):
+        node = key.split(':', 1)[1]
+        if node in evaluated_nodes and key not in fired:
+            del active[key]
+
+    now = datetime.now().isoformat(timespec='seconds')
+    new_alerts = []
+    for key, message in fired.items():
+        if key not in active:
+            active[key] = now
+            new_alerts.append(message)
+    return new_alerts
+
+def build_alert_message(alerts, max_len=4000):
+    """Собирает компактный текст алертов с учетом лимита сообщения Telegram (4096)"""
+    if not alerts:
+        return None
+
+    lines = [f"⚠ алерты ({len(alerts)}):"]
+    shown_count = 0
+    for alert in alerts:
+        if len("\n".join(lines + [alert])) > max_len:
+            break
+        lines.append(alert)
+        shown_count += 1
+
+    remaining = len(alerts) - shown_count
+    if remaining > 0:
+        lines.append(f"... (+{remaining} more)")
+
+    return "\n".join(lines)
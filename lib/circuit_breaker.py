@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Circuit breaker для хронически недоступных нод.
+
+Состояние хранится в JSON файле между запусками:
+    {"host:port": {"failures": 3, "down_since": "2024-01-05T08:00:00"}}
+
+Нода считается "открытой" (open), если подряд не ответила
+CIRCUIT_FAILURE_THRESHOLD раз. Такие ноды не опрашиваются полностью,
+а только проверяются одним быстрым запросом, пока не оживут.
+"""
+import json
+import os
+from datetime import datetime
+
+def load_circuit_state(state_file):
+    """Читает состояние circuit breaker из файла"""
+    if not os.path.exists(state_file):
+        return {}
+    try:
+        with open(state_file, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        return state if isinstance(state, dict) else {}
+    except (OSError, ValueError) as e:
+        print(f"✗ Не удалось прочитать состояние нод {state_file}: {e}")
+        return {}
+
+def save_circuit_state(state_file, state):
+    """Сохраняет состояние circuit breaker в файл"""
+    try:
+        with open(state_file, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=2, ensure_ascii=False)
+        return True
+    except OSError as e:
+        print(f"✗ Не удалось сохранить состояние нод {state_file}: {e}")
+        return False
+
+def is_circuit_open(state, node, threshold):
+    """Проверяет, превысила ли нода порог подряд идущих отказов"""
+    return state.get(node, {}).get('failures', 0) >= threshold
+
+def record_success(state, node):
+    """Сбрасывает счетчик отказов ноды"""
+    state.pop(node, None)
+
+def record_failure(state, node, now=None):
+    """Увеличивает счетчик отказов ноды, запоминая начало серии отказов"""
+    if now is None:
+        now = datetime.now()
+    node_state = state.setdefault(node, {'failures': 0, 'down_since': None})
+    node_state['failures'] = node_state.get('failures', 0) + 1
+    if not node_state.get('down_since'):
+        node_state['down_since'] = now.isoformat(timespec='seconds')
+
+def get_down_since(state, node, threshold):
+    """Возвращает время начала отказов для открытой ноды (или None)"""
+    if not is_circuit_open(state, node, threshold):
+        return None
+    return state.get(node, {}).get('down_since')
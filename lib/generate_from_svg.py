@@ -5,12 +5,11 @@
 import json
 import math
 import os
-import sys
-from datetime import datetime
+import re
+from datetime import datetime, timezone
+from xml.sax.saxutils import escape
 
-# Импорт из той же папки
-sys.path.insert(0, os.path.dirname(__file__))
-from svg_to_png import svg_to_png
+from template_pack import render_compiled, resolve_template, get_pack_placeholders
 
 def bytes_to_gb(bytes_value):
     """Конвертирует байты в GB"""
@@ -40,25 +39,187 @@ def load_node_data(json_file):
     with open(json_file, 'r', encoding='utf-8') as f:
         return json.load(f)
 
-def generate_svg_from_data(data, template_file, output_svg_file, stats=None):
-    """Генерирует SVG из шаблона с подстановкой данных"""
+# Секция плейсхолдера - слово после типа: {{fltEarningsPaid}} → Earnings
+PLACEHOLDER_SECTION_PATTERN = re.compile(r'^(?:str|flt|int)([A-Z][a-z]*)')
+
+# Какие роуты API нужны для каждой секции карточки.
+# Секции, которых нет в словаре (Header, Date), не требуют данных от нод
+SECTION_ROUTES = {
+    'Earnings': ('/api/sno/estimated-payout',),
+    'Storage': ('/api/sno',),
+    'Bandwidth': ('/api/sno/satellites',),
+    # Графики строятся по истории, которая пополняется из всех трех роутов
+    'Chart': ('/api/sno', '/api/sno/estimated-payout', '/api/sno/satellites'),
+    # Список спутников берется из /api/sno, данные по ним - из опроса по каждому спутнику
+    'Satellite': ('/api/sno',),
+    # Итоги по месяцам и годам пополняются из ответов нод на estimated-payout
+    'Period': ('/api/sno/estimated-payout',),
+}
+
+# Ключ матрицы спутник × метрика в агрегированных данных (см. aggregate.SATELLITE_ROUTE)
+SATELLITE_DATA_KEY = '/api/sno/satellite'
+
+def get_template_placeholders(template_file, variant=None):
+    """Возвращает множество имен плейсхолдеров, используемых в шаблоне (SVG или пакете)"""
+    pack, default_variant = resolve_template(template_file)
+    return get_pack_placeholders(pack, [variant or default_variant])
+
+def get_template_sections(placeholders):
+    """Возвращает множество секций карточки, которые есть в шаблоне"""
+    sections = set()
+    for name in placeholders:
+        match = PLACEHOLDER_SECTION_PATTERN.match(name)
+        if match:
+            sections.add(match.group(1))
+    return sections
+
+def get_section_routes(sections):
+    """Возвращает список роутов API, данные которых нужны секциям карточки"""
+    routes = []
+    for section, section_routes in SECTION_ROUTES.items():
+        if section not in sections:
+            continue
+        for route in section_routes:
+            if route not in routes:
+                routes.append(route)
+    return routes
+
+def get_required_routes(placeholders):
+    """Возвращает список роутов API, данные которых нужны шаблону"""
+    return get_section_routes(get_template_sections(placeholders))
+
+def get_missing_routes(data, routes):
+    """Возвращает роуты, по которым в агрегированных данных нет данных"""
+    return [route for route in routes if not (data or {}).get(route, {}).get('data')]
+
+def downsample(values, max_points):
+    """Усредняет соседние значения, если их больше, чем max_points"""
+    if max_points < 1 or len(values) <= max_points:
+        return list(values)
+    result = []
+    count = len(values)
+    for i in range(max_points):
+        start = i * count // max_points
+        end = (i + 1) * count // max_points
+        bucket = values[start:end]
+        result.append(sum(bucket) / len(bucket))
+    return result
+
+def build_bar_chart_path(values, width, height, min_bar_px=2):
+    """Строит один SVG path со столбиками для всех значений (ось Y вниз, 0 - верх области)"""
+    values = downsample(values, int(width // min_bar_px))
+    max_value = max(values) if values else 0
+    if max_value <= 0:
+        return ''
+    
+    slot = width / len(values)
+    bar = max(slot * 0.7, 1)
+    parts = []
+    for i, value in enumerate(values):
+        bar_height = value / max_value * height
+        if bar_height <= 0:
+            continue
+        x = i * slot + (slot - bar) / 2
+        parts.append(f'M{x:.1f} {height}v-{bar_height:.1f}h{bar:.1f}v{bar_height:.1f}Z')
+    return ''.join(parts)
+
+def build_sparkline_path(values, width, height):
+    """Строит SVG path ломаной по значениям (масштаб от минимума до максимума)"""
+    values = downsample(values, int(width))
+    if not values:
+        return ''
+    
+    min_value = min(values)
+    max_value = max(values)
+    value_range = max_value - min_value
+    step = width / (len(values) - 1) if len(values) > 1 else 0
+    parts = []
+    for i, value in enumerate(values):
+        y = height - ((value - min_value) / value_range * height if value_range > 0 else height / 2)
+        parts.append(f'{"M" if i == 0 else "L"}{i * step:.1f} {y:.1f}')
+    return ''.join(parts)
+
+def build_satellite_table_rows(matrix, max_rows=4, row_height=26, columns=(22, 420, 540, 660, 760, 850, 906)):
+    """Строит строки таблицы по спутникам (SVG <text>), отсортированные по занятому месту
+    
+    Args:
+        columns: x колонок: имя (по левому краю), остальные - по правому краю
+    """
+    text_attrs = 'font-family="Ubuntu, sans-serif" font-size="18" fill="#000000" font-weight="300"'
+    name_x = columns[0]
+    if not matrix:
+        return (f'<text x="{name_x}" y="0" {text_attrs} fill-opacity="0.5">'
+                f'no per-satellite data</text>')
+    
+    rows = sorted(matrix.values(), key=lambda row: row.get('stored', 0), reverse=True)
+    shown = rows[:max_rows]
+    if len(rows) > max_rows:
+        # Последнюю строку отдаем под счетчик скрытых спутников
+        shown = rows[:max_rows - 1]
+    
+    lines = []
+    for i, row in enumerate(shown):
+        y = i * row_height
+        nodes = row.get('nodes', 0)
+        audit = row.get('auditScoreSum', 0) / nodes * 100 if nodes else 0
+        online = row.get('onlineScoreSum', 0) / nodes * 100 if nodes else 0
+        stored_value, stored_unit = format_storage_gb(bytes_to_gb(row.get('stored', 0)))
+        ingress_value, ingress_unit = format_storage_gb(bytes_to_gb(row.get('ingress', 0)))
+        egress_value, egress_unit = format_storage_gb(bytes_to_gb(row.get('egress', 0)))
+        cells = [
+            f'{stored_value} {stored_unit}',
+            f'{ingress_value} {ingress_unit}',
+            f'{egress_value} {egress_unit}',
+            f'{audit:.2f}%',
+            f'{online:.2f}%',
+            # Если часть нод не отдала данные по спутнику, показываем nodes/всего
+            f"{nodes}/{nodes + row['failed']}" if row.get('failed') else str(nodes),
+        ]
+        
+        lines.append(f'<text x="{name_x}" y="{y}" {text_attrs}>{escape(str(row.get("name", "")))}</text>')
+        for x, cell in zip(columns[1:], cells):
+            lines.append(f'<text x="{x}" y="{y}" {text_attrs} text-anchor="end">{cell}</text>')
+    
+    if len(shown) < len(rows):
+        y = len(shown) * row_height
+        lines.append(f'<text x="{name_x}" y="{y}" {text_attrs} fill-opacity="0.5">... (+{len(rows) - len(shown)} more)</text>')
+    
+    return ''.join(lines)
+
+def build_pie_paths(ingress_share, radius):
+    """Строит пути двух секторов круговой диаграммы ingress / egress"""
+    ingress_angle_deg = ingress_share * 360
+    
+    ingress_angle_rad = math.radians(ingress_angle_deg)
+    ingress_end_x = radius * math.sin(ingress_angle_rad)
+    ingress_end_y = -radius * math.cos(ingress_angle_rad)
+    
+    large_arc = 1 if ingress_angle_deg > 180 else 0
+    
+    ingress_path = f'M 0 0 L 0 -{radius} A {radius} {radius} 0 {large_arc} 1 {ingress_end_x:.2f} {ingress_end_y:.2f} Z'
+    egress_path = f'M 0 0 L {ingress_end_x:.2f} {ingress_end_y:.2f} A {radius} {radius} 0 {1 - large_arc if ingress_angle_deg < 180 else 0} 1 0 -{radius} Z'
+    return ingress_path, egress_path
+
+def compute_card_values(data, sections, stats=None, series=None, periods=None):
+    """Считает значения карточки, не зависящие от геометрии шаблона
     
-    # Читаем шаблон
-    with open(template_file, 'r', encoding='utf-8') as f:
-        svg_content = f.read()
+    Args:
+        periods: отчет по периодам (см. rollups.build_period_report)
     
-    # Извлекаем данные из API ответов
-    sno_data = data['/api/sno']['data']
-    payout_data = data['/api/sno/estimated-payout']['data']
-    satellites_data = data['/api/sno/satellites']['data']
+    Returns:
+        dict: {'values': готовые строки плейсхолдеров,
+               'shares': доли для полос и диаграммы (геометрия применяется в layout_card_values),
+               'series': ряды для графиков, 'satellites': матрица по спутникам}
+    """
+    values = {}
+    shares = {}
     
-    # Получаем последний элемент bandwidthDaily
-    bandwidth_daily = satellites_data['bandwidthDaily']
-    last_day = bandwidth_daily[-1] if bandwidth_daily else {}
+    missing_routes = get_missing_routes(data, get_section_routes(sections))
+    if missing_routes:
+        raise ValueError(f"нет данных для шаблона: {', '.join(missing_routes)}")
     
     # === ЗАГОЛОВОК ===
-    current_date = datetime.now().strftime('%d.%m.%Y')
-    svg_content = svg_content.replace('{{strDateCurrent}}', current_date)
+    values['strDateCurrent'] = datetime.now().strftime('%d.%m.%Y')
 
     # Статистика по нодам (для заголовка)
     nodes_success = None
@@ -75,168 +236,291 @@ def generate_svg_from_data(data, template_file, output_svg_file, stats=None):
     # Красный цвет только если не все ноды ответили
     nodes_fill = "#ff0000" if (nodes_total > 0 and nodes_success < nodes_total) else "#000000"
 
-    svg_content = svg_content.replace('{{strHeaderNodesSuccess}}', str(nodes_success))
-    svg_content = svg_content.replace('{{strHeaderNodesTotal}}', str(nodes_total))
-    svg_content = svg_content.replace('{{strHeaderNodesFill}}', nodes_fill)
+    values['strHeaderNodesSuccess'] = str(nodes_success)
+    values['strHeaderNodesTotal'] = str(nodes_total)
+    values['strHeaderNodesFill'] = nodes_fill
     
     # === EARNINGS ===
-    paid = round(cents_to_dollars(payout_data['currentMonth']['payout']), 2)
-    held = round(cents_to_dollars(payout_data['currentMonth']['held']), 2)
-    total_expected = round(cents_to_dollars(payout_data['currentMonthExpectations']), 2)
-    
-    storage_earnings = round(cents_to_dollars(payout_data['currentMonth']['diskSpacePayout']), 2)
-    egress_earnings = round(cents_to_dollars(payout_data['currentMonth']['egressBandwidthPayout']), 2)
-    repair_audit_earnings = round(cents_to_dollars(payout_data['currentMonth']['egressRepairAuditPayout']), 2)
-    
-    # Заменяем значения earnings
-    svg_content = svg_content.replace('{{fltEarningsPaid}}', f'{paid:.2f}')
-    svg_content = svg_content.replace('{{fltEarningsHeld}}', f'{held:.2f}')
-    svg_content = svg_content.replace('{{fltEarningsTotalExpected}}', f'{total_expected:.2f}')
-    svg_content = svg_content.replace('{{fltEarningsStorage}}', f'{storage_earnings:.2f}')
-    svg_content = svg_content.replace('{{fltEarningsEgress}}', f'{egress_earnings:.2f}')
-    svg_content = svg_content.replace('{{fltEarningsRepairAudit}}', f'{repair_audit_earnings:.2f}')
-    
-    # Вычисляем ширины полос earnings
-    bar_width = 880
-    storage_width = int((storage_earnings / total_expected) * bar_width) if total_expected > 0 else 0
-    egress_width = int((egress_earnings / total_expected) * bar_width) if total_expected > 0 else 0
-    repair_audit_width = int((repair_audit_earnings / total_expected) * bar_width) if total_expected > 0 else 0
-    held_width = int((held / total_expected) * bar_width) if total_expected > 0 else 0
-    
-    # Вычисляем X координаты
-    egress_x = 22 + storage_width
-    repair_audit_x = 22 + storage_width + egress_width
-    held_x = 22 + storage_width + egress_width + repair_audit_width
-    
-    # Заменяем ширины и координаты earnings
-    svg_content = svg_content.replace('{{intEarningsBarWidthStorage}}', str(storage_width))
-    svg_content = svg_content.replace('{{intEarningsBarWidthEgress}}', str(egress_width))
-    svg_content = svg_content.replace('{{intEarningsBarWidthRepairAudit}}', str(repair_audit_width))
-    svg_content = svg_content.replace('{{intEarningsBarWidthHeld}}', str(held_width))
-    svg_content = svg_content.replace('{{intEarningsBarXEgress}}', str(egress_x))
-    svg_content = svg_content.replace('{{intEarningsBarXRepairAudit}}', str(repair_audit_x))
-    svg_content = svg_content.replace('{{intEarningsBarXHeld}}', str(held_x))
+    if 'Earnings' in sections:
+        payout_data = data['/api/sno/estimated-payout']['data']
+        
+        paid = round(cents_to_dollars(payout_data['currentMonth']['payout']), 2)
+        held = round(cents_to_dollars(payout_data['currentMonth']['held']), 2)
+        total_expected = round(cents_to_dollars(payout_data['currentMonthExpectations']), 2)
+        
+        storage_earnings = round(cents_to_dollars(payout_data['currentMonth']['diskSpacePayout']), 2)
+        egress_earnings = round(cents_to_dollars(payout_data['currentMonth']['egressBandwidthPayout']), 2)
+        repair_audit_earnings = round(cents_to_dollars(payout_data['currentMonth']['egressRepairAuditPayout']), 2)
+        
+        values['fltEarningsPaid'] = f'{paid:.2f}'
+        values['fltEarningsHeld'] = f'{held:.2f}'
+        values['fltEarningsTotalExpected'] = f'{total_expected:.2f}'
+        values['fltEarningsStorage'] = f'{storage_earnings:.2f}'
+        values['fltEarningsEgress'] = f'{egress_earnings:.2f}'
+        values['fltEarningsRepairAudit'] = f'{repair_audit_earnings:.2f}'
+        
+        # Доли сегментов полосы earnings от ожидаемого total
+        if total_expected > 0:
+            shares['earnings'] = [
+                storage_earnings / total_expected,
+                egress_earnings / total_expected,
+                repair_audit_earnings / total_expected,
+                held / total_expected,
+            ]
+        else:
+            shares['earnings'] = [0, 0, 0, 0]
     
     # === STORAGE ===
-    storage_used = bytes_to_gb(sno_data['diskSpace']['used'])
-    storage_trash = bytes_to_gb(sno_data['diskSpace']['trash'])
-    storage_total = storage_used + storage_trash
-    
-    storage_total_value, storage_total_unit = format_storage_gb(storage_total)
-    storage_used_value, storage_used_unit = format_storage_gb(storage_used)
-    storage_trash_value, storage_trash_unit = format_storage_gb(storage_trash)
-    
-    # Вычисляем процент trash от used
-    storage_trash_percent = round((storage_trash / storage_used) * 100, 2) if storage_used > 0 else 0.0
-    
-    # Заменяем значения storage
-    svg_content = svg_content.replace('{{strStorageTotalValue}}', storage_total_value)
-    svg_content = svg_content.replace('{{strStorageTotalUnit}}', storage_total_unit)
-    svg_content = svg_content.replace('{{strStorageUsedValue}}', storage_used_value)
-    svg_content = svg_content.replace('{{strStorageUsedUnit}}', storage_used_unit)
-    svg_content = svg_content.replace('{{strStorageTrashValue}}', storage_trash_value)
-    svg_content = svg_content.replace('{{strStorageTrashUnit}}', storage_trash_unit)
-    svg_content = svg_content.replace('{{fltStorageTrashPercent}}', f'{storage_trash_percent:.2f}')
-    
-    # Вычисляем ширины полос storage
-    storage_bar_width = 880
-    used_width = int((storage_used / storage_total) * storage_bar_width) if storage_total > 0 else 0
-    trash_width = storage_bar_width - used_width
-    trash_x = 22 + used_width
-    
-    svg_content = svg_content.replace('{{intStorageBarWidthUsed}}', str(used_width))
-    svg_content = svg_content.replace('{{intStorageBarWidthTrash}}', str(trash_width))
-    svg_content = svg_content.replace('{{intStorageBarXTrash}}', str(trash_x))
+    if 'Storage' in sections:
+        sno_data = data['/api/sno']['data']
+        
+        storage_used = bytes_to_gb(sno_data['diskSpace']['used'])
+        storage_trash = bytes_to_gb(sno_data['diskSpace']['trash'])
+        storage_total = storage_used + storage_trash
+        
+        storage_total_value, storage_total_unit = format_storage_gb(storage_total)
+        storage_used_value, storage_used_unit = format_storage_gb(storage_used)
+        storage_trash_value, storage_trash_unit = format_storage_gb(storage_trash)
+        
+        # Вычисляем процент trash от used
+        storage_trash_percent = round((storage_trash / storage_used) * 100, 2) if storage_used > 0 else 0.0
+        
+        values['strStorageTotalValue'] = storage_total_value
+        values['strStorageTotalUnit'] = storage_total_unit
+        values['strStorageUsedValue'] = storage_used_value
+        values['strStorageUsedUnit'] = storage_used_unit
+        values['strStorageTrashValue'] = storage_trash_value
+        values['strStorageTrashUnit'] = storage_trash_unit
+        values['fltStorageTrashPercent'] = f'{storage_trash_percent:.2f}'
+        
+        shares['storage_used'] = storage_used / storage_total if storage_total > 0 else 0
     
     # === BANDWIDTH ===
-    # Данные за все время (суммируются все дни из bandwidthDaily)
-    ingress_usage = bytes_to_gb(last_day.get('ingress', {}).get('usage', 0))
-    ingress_repair = bytes_to_gb(last_day.get('ingress', {}).get('repair', 0))
-    egress_usage = bytes_to_gb(last_day.get('egress', {}).get('usage', 0))
-    egress_repair = bytes_to_gb(last_day.get('egress', {}).get('repair', 0))
-    egress_audit = bytes_to_gb(last_day.get('egress', {}).get('audit', 0))
-    egress_repair_audit_total = egress_repair + egress_audit
-    
-    # Total для заголовка - сумма за все время
-    ingress_total = ingress_usage + ingress_repair
-    egress_total = egress_usage + egress_repair_audit_total
-    
-    ingress_total_value, ingress_total_unit = format_storage_gb(ingress_total)
-    egress_total_value, egress_total_unit = format_storage_gb(egress_total)
-    ingress_usage_value, ingress_usage_unit = format_storage_gb(ingress_usage)
-    ingress_repair_value, ingress_repair_unit = format_storage_gb(ingress_repair)
-    egress_usage_value, egress_usage_unit = format_storage_gb(egress_usage)
-    egress_repair_audit_value, egress_repair_audit_unit = format_storage_gb(egress_repair_audit_total)
-    
-    # Вычисляем общий total (ingress + egress)
-    bandwidth_total = ingress_total + egress_total
-    bandwidth_total_value, bandwidth_total_unit = format_storage_gb(bandwidth_total)
-    
-    # Заменяем значения bandwidth
-    svg_content = svg_content.replace('{{strBandwidthIngressTotalValue}}', ingress_total_value)
-    svg_content = svg_content.replace('{{strBandwidthIngressTotalUnit}}', ingress_total_unit)
-    svg_content = svg_content.replace('{{strBandwidthEgressTotalValue}}', egress_total_value)
-    svg_content = svg_content.replace('{{strBandwidthEgressTotalUnit}}', egress_total_unit)
-    svg_content = svg_content.replace('{{strBandwidthIngressUsageValue}}', ingress_usage_value)
-    svg_content = svg_content.replace('{{strBandwidthIngressUsageUnit}}', ingress_usage_unit)
-    svg_content = svg_content.replace('{{strBandwidthIngressRepairValue}}', ingress_repair_value)
-    svg_content = svg_content.replace('{{strBandwidthIngressRepairUnit}}', ingress_repair_unit)
-    svg_content = svg_content.replace('{{strBandwidthEgressUsageValue}}', egress_usage_value)
-    svg_content = svg_content.replace('{{strBandwidthEgressUsageUnit}}', egress_usage_unit)
-    svg_content = svg_content.replace('{{strBandwidthEgressRepairAuditValue}}', egress_repair_audit_value)
-    svg_content = svg_content.replace('{{strBandwidthEgressRepairAuditUnit}}', egress_repair_audit_unit)
-    svg_content = svg_content.replace('{{strBandwidthTotalValue}}', bandwidth_total_value)
-    svg_content = svg_content.replace('{{strBandwidthTotalUnit}}', bandwidth_total_unit)
-    
-    # Вычисляем ширины полос bandwidth
-    bandwidth_bar_width = 713
-    ingress_total_for_bar = ingress_usage + ingress_repair
-    ingress_usage_width = int((ingress_usage / ingress_total_for_bar) * bandwidth_bar_width) if ingress_total_for_bar > 0 else 0
-    ingress_repair_width = int((ingress_repair / ingress_total_for_bar) * bandwidth_bar_width) if ingress_total_for_bar > 0 else 0
-    
-    egress_total_for_bar = egress_usage + egress_repair_audit_total
-    egress_usage_width = int((egress_usage / egress_total_for_bar) * bandwidth_bar_width) if egress_total_for_bar > 0 else 0
-    egress_repair_audit_width = int((egress_repair_audit_total / egress_total_for_bar) * bandwidth_bar_width) if egress_total_for_bar > 0 else 0
-    
-    ingress_repair_x = 189 + ingress_usage_width
-    egress_repair_audit_x = 189 + egress_usage_width
-    
-    svg_content = svg_content.replace('{{intBandwidthBarWidthIngressUsage}}', str(ingress_usage_width))
-    svg_content = svg_content.replace('{{intBandwidthBarWidthIngressRepair}}', str(ingress_repair_width))
-    svg_content = svg_content.replace('{{intBandwidthBarWidthEgressUsage}}', str(egress_usage_width))
-    svg_content = svg_content.replace('{{intBandwidthBarWidthEgressRepairAudit}}', str(egress_repair_audit_width))
-    svg_content = svg_content.replace('{{intBandwidthBarXIngressRepair}}', str(ingress_repair_x))
-    svg_content = svg_content.replace('{{intBandwidthBarXEgressRepairAudit}}', str(egress_repair_audit_x))
-    
-    # Вычисляем углы для круговой диаграммы
-    total_bandwidth = ingress_total + egress_total
-    if total_bandwidth > 0:
-        ingress_angle_deg = (ingress_total / total_bandwidth * 360)
-    else:
-        ingress_angle_deg = 0
+    if 'Bandwidth' in sections:
+        satellites_data = data['/api/sno/satellites']['data']
+        
+        # Получаем последний элемент bandwidthDaily
+        bandwidth_daily = satellites_data['bandwidthDaily']
+        last_day = bandwidth_daily[-1] if bandwidth_daily else {}
+        
+        # Данные за все время (суммируются все дни из bandwidthDaily)
+        ingress_usage = bytes_to_gb(last_day.get('ingress', {}).get('usage', 0))
+        ingress_repair = bytes_to_gb(last_day.get('ingress', {}).get('repair', 0))
+        egress_usage = bytes_to_gb(last_day.get('egress', {}).get('usage', 0))
+        egress_repair = bytes_to_gb(last_day.get('egress', {}).get('repair', 0))
+        egress_audit = bytes_to_gb(last_day.get('egress', {}).get('audit', 0))
+        egress_repair_audit_total = egress_repair + egress_audit
+        
+        # Total для заголовка - сумма за все время
+        ingress_total = ingress_usage + ingress_repair
+        egress_total = egress_usage + egress_repair_audit_total
+        
+        ingress_total_value, ingress_total_unit = format_storage_gb(ingress_total)
+        egress_total_value, egress_total_unit = format_storage_gb(egress_total)
+        ingress_usage_value, ingress_usage_unit = format_storage_gb(ingress_usage)
+        ingress_repair_value, ingress_repair_unit = format_storage_gb(ingress_repair)
+        egress_usage_value, egress_usage_unit = format_storage_gb(egress_usage)
+        egress_repair_audit_value, egress_repair_audit_unit = format_storage_gb(egress_repair_audit_total)
+        
+        # Вычисляем общий total (ingress + egress)
+        bandwidth_total = ingress_total + egress_total
+        bandwidth_total_value, bandwidth_total_unit = format_storage_gb(bandwidth_total)
+        
+        values['strBandwidthIngressTotalValue'] = ingress_total_value
+        values['strBandwidthIngressTotalUnit'] = ingress_total_unit
+        values['strBandwidthEgressTotalValue'] = egress_total_value
+        values['strBandwidthEgressTotalUnit'] = egress_total_unit
+        values['strBandwidthIngressUsageValue'] = ingress_usage_value
+        values['strBandwidthIngressUsageUnit'] = ingress_usage_unit
+        values['strBandwidthIngressRepairValue'] = ingress_repair_value
+        values['strBandwidthIngressRepairUnit'] = ingress_repair_unit
+        values['strBandwidthEgressUsageValue'] = egress_usage_value
+        values['strBandwidthEgressUsageUnit'] = egress_usage_unit
+        values['strBandwidthEgressRepairAuditValue'] = egress_repair_audit_value
+        values['strBandwidthEgressRepairAuditUnit'] = egress_repair_audit_unit
+        values['strBandwidthTotalValue'] = bandwidth_total_value
+        values['strBandwidthTotalUnit'] = bandwidth_total_unit
+        
+        # Доли полос bandwidth и сектора ingress на круговой диаграмме
+        if ingress_total > 0:
+            shares['ingress'] = [ingress_usage / ingress_total, ingress_repair / ingress_total]
+        else:
+            shares['ingress'] = [0, 0]
+        if egress_total > 0:
+            shares['egress'] = [egress_usage / egress_total, egress_repair_audit_total / egress_total]
+        else:
+            shares['egress'] = [0, 0]
+        shares['pie_ingress'] = ingress_total / bandwidth_total if bandwidth_total > 0 else 0
+    
+    # === CHARTS ===
+    if 'Chart' in sections:
+        if series is None:
+            series = {}
+        ingress_series = series.get('ingress', [])
+        egress_series = series.get('egress', [])
+        stored_series = series.get('stored', [])
+        earnings_series = series.get('earnings', [])
+        
+        chart_ingress_value, chart_ingress_unit = format_storage_gb(bytes_to_gb(sum(ingress_series)))
+        chart_egress_value, chart_egress_unit = format_storage_gb(bytes_to_gb(sum(egress_series)))
+        chart_stored_value, chart_stored_unit = format_storage_gb(bytes_to_gb(stored_series[-1] if stored_series else 0))
+        chart_earnings = round(cents_to_dollars(sum(earnings_series)), 2)
+        
+        values['intChartDays'] = str(len(series.get('dates', [])))
+        values['strChartIngressValue'] = chart_ingress_value
+        values['strChartIngressUnit'] = chart_ingress_unit
+        values['strChartEgressValue'] = chart_egress_value
+        values['strChartEgressUnit'] = chart_egress_unit
+        values['strChartStoredValue'] = chart_stored_value
+        values['strChartStoredUnit'] = chart_stored_unit
+        values['fltChartEarnings'] = f'{chart_earnings:.2f}'
+    
+    # === PERIODS ===
+    if 'Period' in sections:
+        if periods is None:
+            periods = {}
+        last_month = periods.get('last_month', {})
+        year_to_date = periods.get('year_to_date', {})
+        
+        values['intPeriodYear'] = str(periods.get('year', datetime.now(timezone.utc).year))
+        values['fltPeriodLastMonth'] = f"{cents_to_dollars(last_month.get('payout', 0)):.2f}"
+        values['fltPeriodYearToDate'] = f"{cents_to_dollars(year_to_date.get('payout', 0)):.2f}"
+        values['fltPeriodHeldYearToDate'] = f"{cents_to_dollars(year_to_date.get('held', 0)):.2f}"
+    
+    # === SATELLITES ===
+    satellite_matrix = None
+    if 'Satellite' in sections:
+        satellite_matrix = (data.get(SATELLITE_DATA_KEY) or {}).get('data')
+    
+    return {
+        'sections': set(sections),
+        'values': values,
+        'shares': shares,
+        'series': series or {},
+        'satellites': satellite_matrix
+    }
+
+def layout_card_values(derived, geometry):
+    """Достраивает значения, зависящие от геометрии варианта (ширины полос, пути графиков)"""
+    values = dict(derived['values'])
+    shares = derived['shares']
+    sections = derived['sections']
     
-    radius = 66
-    ingress_angle_rad = math.radians(ingress_angle_deg)
-    ingress_end_x = radius * math.sin(ingress_angle_rad)
-    ingress_end_y = -radius * math.cos(ingress_angle_rad)
+    # === EARNINGS ===
+    if 'earnings' in shares:
+        bar_x = geometry['earnings_bar']['x']
+        bar_width = geometry['earnings_bar']['width']
+        storage_width, egress_width, repair_audit_width, held_width = [
+            int(share * bar_width) for share in shares['earnings']
+        ]
+        
+        values['intEarningsBarWidthStorage'] = str(storage_width)
+        values['intEarningsBarWidthEgress'] = str(egress_width)
+        values['intEarningsBarWidthRepairAudit'] = str(repair_audit_width)
+        values['intEarningsBarWidthHeld'] = str(held_width)
+        values['intEarningsBarXEgress'] = str(bar_x + storage_width)
+        values['intEarningsBarXRepairAudit'] = str(bar_x + storage_width + egress_width)
+        values['intEarningsBarXHeld'] = str(bar_x + storage_width + egress_width + repair_audit_width)
     
-    large_arc = 1 if ingress_angle_deg > 180 else 0
+    # === STORAGE ===
+    if 'storage_used' in shares:
+        bar_x = geometry['storage_bar']['x']
+        bar_width = geometry['storage_bar']['width']
+        used_width = int(shares['storage_used'] * bar_width)
+        
+        values['intStorageBarWidthUsed'] = str(used_width)
+        values['intStorageBarWidthTrash'] = str(bar_width - used_width)
+        values['intStorageBarXTrash'] = str(bar_x + used_width)
     
-    ingress_path = f'M 0 0 L 0 -{radius} A {radius} {radius} 0 {large_arc} 1 {ingress_end_x:.2f} {ingress_end_y:.2f} Z'
-    egress_path = f'M 0 0 L {ingress_end_x:.2f} {ingress_end_y:.2f} A {radius} {radius} 0 {1 - large_arc if ingress_angle_deg < 180 else 0} 1 0 -{radius} Z'
+    # === BANDWIDTH ===
+    if 'ingress' in shares:
+        bar_x = geometry['bandwidth_bar']['x']
+        bar_width = geometry['bandwidth_bar']['width']
+        ingress_usage_width, ingress_repair_width = [int(share * bar_width) for share in shares['ingress']]
+        egress_usage_width, egress_repair_audit_width = [int(share * bar_width) for share in shares['egress']]
+        
+        values['intBandwidthBarWidthIngressUsage'] = str(ingress_usage_width)
+        values['intBandwidthBarWidthIngressRepair'] = str(ingress_repair_width)
+        values['intBandwidthBarWidthEgressUsage'] = str(egress_usage_width)
+        values['intBandwidthBarWidthEgressRepairAudit'] = str(egress_repair_audit_width)
+        values['intBandwidthBarXIngressRepair'] = str(bar_x + ingress_usage_width)
+        values['intBandwidthBarXEgressRepairAudit'] = str(bar_x + egress_usage_width)
+        
+        ingress_path, egress_path = build_pie_paths(shares['pie_ingress'], geometry['pie']['radius'])
+        values['strBandwidthPiePathIngress'] = ingress_path
+        values['strBandwidthPiePathEgress'] = egress_path
+    
+    # === CHARTS ===
+    if 'Chart' in sections:
+        series = derived['series']
+        chart_width = geometry['chart']['width']
+        chart_height = geometry['chart']['height']
+        
+        values['strChartPathIngress'] = build_bar_chart_path(series.get('ingress', []), chart_width, chart_height)
+        values['strChartPathEgress'] = build_bar_chart_path(series.get('egress', []), chart_width, chart_height)
+        values['strChartPathStored'] = build_sparkline_path(series.get('stored', []), chart_width, chart_height)
+        values['strChartPathEarnings'] = build_bar_chart_path(series.get('earnings', []), chart_width, chart_height)
+    
+    # === SATELLITES ===
+    if 'Satellite' in sections:
+        table = geometry['satellite_table']
+        values['strSatelliteTableRows'] = build_satellite_table_rows(
+            derived['satellites'], max_rows=table['max_rows'], row_height=table['row_height'],
+            columns=table['columns']
+        )
+    
+    return values
+
+def render_variant(variant, derived):
+    """Собирает SVG одного варианта пакета из заранее посчитанных значений"""
+    return render_compiled(variant['segments'], layout_card_values(derived, variant['geometry']))
+
+def generate_svg_variants(data, pack, variant_names, output_svg_files, stats=None, series=None, periods=None):
+    """Генерирует несколько вариантов пакета из одного агрегата
+    
+    Значения, не зависящие от геометрии, считаются один раз на все варианты.
     
-    svg_content = svg_content.replace('{{strBandwidthPiePathIngress}}', ingress_path)
-    svg_content = svg_content.replace('{{strBandwidthPiePathEgress}}', egress_path)
+    Args:
+        output_svg_files: {имя варианта: путь к SVG}
+    """
+    sections = get_template_sections(get_pack_placeholders(pack, variant_names))
+    derived = compute_card_values(data, sections, stats=stats, series=series, periods=periods)
     
-    # Сохраняем SVG
-    with open(output_svg_file, 'w', encoding='utf-8') as f:
-        f.write(svg_content)
+    for name in variant_names:
+        svg_content = render_variant(pack['variants'][name], derived)
+        with open(output_svg_files[name], 'w', encoding='utf-8') as f:
+            f.write(svg_content)
     
     return True
 
+def generate_svg_from_data(data, template_file, output_svg_file, stats=None, series=None, variant=None,
+                           periods=None):
+    """Генерирует SVG из шаблона с подстановкой данных
+    
+    Считаются только секции, плейсхолдеры которых есть в шаблоне, поэтому
+    в data достаточно роутов из get_required_routes().
+    
+    Args:
+        template_file: SVG шаблона или папка пакета шаблонов
+        series: ряды по дням для графиков (см. history.build_fleet_series)
+        variant: вариант пакета (по умолчанию - соответствующий template_file)
+        periods: отчет по периодам (см. rollups.build_period_report)
+    """
+    pack, default_variant = resolve_template(template_file)
+    variant = variant or default_variant
+    return generate_svg_variants(data, pack, [variant], {variant: output_svg_file}, stats=stats, series=series,
+                                 periods=periods)
+
 if __name__ == "__main__":
+    import sys
+    
+    # Импорт из той же папки
+    sys.path.insert(0, os.path.dirname(__file__))
+    from svg_to_png import svg_to_png
+    
     template_file = "templates/default/index.svg"
-    json_file = "node101_api_results.json"
+    # Агрегированные данные в формате aggregate_data (например, aggregated_data.json)
+    json_file = sys.argv[1] if len(sys.argv) > 1 else "aggregated_data.json"
     output_svg = "storj_card_generated.svg"
     output_png = "storj_card_generated.png"
     
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+История агрегированных по всем нодам показателей по дням.
+
+Хранится в JSON файле между запусками:
+    {"2024-01-05": {"ingress": 123, "egress": 456, "stored": 789, "earnings": 1011}}
+
+ingress/egress - байты за день (из bandwidthDaily), stored - занятое место
+в байтах на момент опроса, earnings - заработок за день в центах.
+Дни - по UTC, как в bandwidthDaily и payout нод.
+
+earnings - сумма приростов payout нод, которые считает rollups.update_node_rollup
+(снимки нод хранятся только там). Нода, которая не ответила, в этот день
+ничего не добавляет, а после возвращения добавляет только прирост
+с последнего снимка, а не весь заработок с начала месяца.
+"""
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+def load_history(history_file):
+    """Читает историю из файла"""
+    if not os.path.exists(history_file):
+        return {}
+    try:
+        with open(history_file, 'r', encoding='utf-8') as f:
+            history = json.load(f)
+        return history if isinstance(history, dict) else {}
+    except (OSError, ValueError) as e:
+        print(f"✗ Не удалось прочитать историю {history_file}: {e}")
+        return {}
+
+def save_history(history_file, history):
+    """Сохраняет историю в файл"""
+    try:
+        with open(history_file, 'w', encoding='utf-8') as f:
+            json.dump(history, f, indent=2, ensure_ascii=False, sort_keys=True)
+        return True
+    except OSError as e:
+        print(f"✗ Не удалось сохранить историю {history_file}: {e}")
+        return False
+
+def update_history(history, aggregated_data, earnings=0, today=None, keep_days=400):
+    """Дописывает в историю данные текущего опроса
+
+    Трафик по дням берется из bandwidthByDay (ноды сами отдают разбивку за месяц),
+    занятое место - снимок на сегодня.
+
+    Args:
+        earnings: прирост payout нод с прошлого опроса в центах
+    """
+    if today is None:
+        today = datetime.now(timezone.utc).date()
+    today_key = today.isoformat()
+
+    sno_data = aggregated_data.get('/api/sno', {}).get('data')
+    satellites_data = aggregated_data.get('/api/sno/satellites', {}).get('data')
+
+    if satellites_data:
+        for day_key, day in satellites_data.get('bandwidthByDay', {}).items():
+            record = history.setdefault(day_key, {})
+            record['ingress'] = day.get('ingress', 0)
+            record['egress'] = day.get('egress', 0)
+
+    if sno_data:
+        history.setdefault(today_key, {})['stored'] = sno_data['diskSpace']['used']
+
+    if earnings:
+        record = history.setdefault(today_key, {})
+        record['earnings'] = record.get('earnings', 0) + earnings
+
+    # Ограничиваем размер файла истории
+    oldest_key = (today - timedelta(days=keep_days)).isoformat()
+    for day_key in [key for key in history if key < oldest_key]:
+        del history[day_key]
+
+    return history
+
+def build_fleet_series(history, days=30, today=None):
+    """Строит ряды по дням за последние days дней (включая сегодня)
+
+    Returns:
+        dict: {'dates': [...], 'ingress': [...], 'egress': [...], 'stored': [...], 'earnings': [...]}
+        earnings - заработок за день в центах
+    """
+    if today is None:
+        today = datetime.now(timezone.utc).date()
+
+    series = {'dates': [], 'ingress': [], 'egress': [], 'stored': [], 'earnings': []}
+
+    for offset in range(days - 1, -1, -1):
+        day = today - timedelta(days=offset)
+        record = history.get(day.isoformat(), {})
+
+        series['dates'].append(day.isoformat())
+        series['ingress'].append(record.get('ingress', 0))
+        series['egress'].append(record.get('egress', 0))
+        series['stored'].append(record.get('stored', 0))
+        series['earnings'].append(record.get('earnings', 0))
+
+    return series
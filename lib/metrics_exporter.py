@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Экспорт агрегированных показателей в формате Prometheus.
+
+Ответ /metrics собирается заранее после каждого опроса (snapshot в байтах),
+поэтому запрос Prometheus не вызывает опрос нод и не зависит от размера флота.
+"""
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Роуты, из которых собираются метрики флота (диск, заработок, трафик)
+METRICS_ROUTES = ['/api/sno', '/api/sno/estimated-payout', '/api/sno/satellites']
+
+def escape_label(value):
+    """Экранирует значение label по правилам exposition format"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def extract_node_metrics(node_results, ok):
+    """Достает из ответов одной ноды показатели для экспорта"""
+    metrics = {'up': 1 if ok else 0}
+
+    disk_space = (node_results.get('/api/sno', {}).get('data') or {}).get('diskSpace') or {}
+    if 'used' in disk_space:
+        metrics['disk_used'] = disk_space['used']
+    if 'trash' in disk_space:
+        metrics['disk_trash'] = disk_space['trash']
+
+    payout_data = node_results.get('/api/sno/estimated-payout', {}).get('data') or {}
+    if 'currentMonth' in payout_data:
+        metrics['payout'] = payout_data['currentMonth'].get('payout', 0)
+    if 'currentMonthExpectations' in payout_data:
+        metrics['expected'] = payout_data['currentMonthExpectations']
+
+    satellites_data = node_results.get('/api/sno/satellites', {}).get('data') or {}
+    if 'ingressSummary' in satellites_data:
+        metrics['ingress'] = satellites_data['ingressSummary']
+    if 'egressSummary' in satellites_data:
+        metrics['egress'] = satellites_data['egressSummary']
+
+    return metrics
+
+def build_metrics_snapshot(aggregated_data, stats, node_metrics, now=None):
+    """Собирает ответ /metrics (bytes) из агрегированных данных и показателей по нодам"""
+    if now is None:
+        now = time.time()
+    aggregated_data = aggregated_data or {}
+    stats = stats or {}
+    lines = []
+
+    def metric(name, metric_type, help_text, samples):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for labels, value in samples:
+            if labels:
+                label_text = ','.join(f'{key}="{escape_label(val)}"' for key, val in labels.items())
+                lines.append(f"{name}{{{label_text}}} {value}")
+            else:
+                lines.append(f"{name} {value}")
+
+    # === FLEET ===
+    metric('storj_nodes_total', 'gauge', 'Number of nodes in nodes file',
+           [({}, stats.get('total', 0))])
+    metric('storj_nodes_up', 'gauge', 'Number of nodes that answered all routes',
+           [({}, stats.get('success', 0))])
+    metric('storj_poll_duration_seconds', 'gauge', 'Duration of the last poll',
+           [({}, f"{stats.get('duration', 0):.3f}")])
+    metric('storj_poll_timestamp_seconds', 'gauge', 'Unix time of the last poll',
+           [({}, f"{now:.0f}")])
+
+    sno_data = aggregated_data.get('/api/sno', {}).get('data')
+    if sno_data:
+        metric('storj_fleet_disk_used_bytes', 'gauge', 'Disk space used by all nodes',
+               [({}, sno_data['diskSpace']['used'])])
+        metric('storj_fleet_disk_trash_bytes', 'gauge', 'Trash size on all nodes',
+               [({}, sno_data['diskSpace']['trash'])])
+
+    payout_data = aggregated_data.get('/api/sno/estimated-payout', {}).get('data')
+    if payout_data:
+        metric('storj_fleet_payout_cents', 'gauge', 'Current month payout of all nodes', [
+            ({'kind': 'paid'}, payout_data['currentMonth']['payout']),
+            ({'kind': 'held'}, payout_data['currentMonth']['held']),
+            ({'kind': 'expected'}, payout_data['currentMonthExpectations']),
+        ])
+
+    satellites_data = aggregated_data.get('/api/sno/satellites', {}).get('data')
+    if satellites_data:
+        metric('storj_fleet_bandwidth_bytes', 'gauge', 'Current month bandwidth of all nodes', [
+            ({'direction': 'ingress'}, satellites_data['ingressSummary']),
+            ({'direction': 'egress'}, satellites_data['egressSummary']),
+        ])
+
+    # === NODES ===
+    nodes = sorted(node_metrics)
+    latency = stats.get('latency', {})
+
+    metric('storj_node_up', 'gauge', 'Node answered all routes',
+           [({'node': node}, node_metrics[node]['up']) for node in nodes])
+    metric('storj_node_poll_latency_seconds', 'gauge', 'Time the node took to answer all routes, without queueing',
+           [({'node': node}, f"{latency[node]:.3f}") for node in nodes if node in latency])
+
+    for key, name, help_text in (
+        ('disk_used', 'storj_node_disk_used_bytes', 'Disk space used by the node'),
+        ('disk_trash', 'storj_node_disk_trash_bytes', 'Trash size on the node'),
+        ('payout', 'storj_node_payout_cents', 'Current month payout of the node'),
+        ('expected', 'storj_node_expected_payout_cents', 'Expected current month payout of the node'),
+    ):
+        samples = [({'node': node}, node_metrics[node][key]) for node in nodes if key in node_metrics[node]]
+        if samples:
+            metric(name, 'gauge', help_text, samples)
+
+    samples = []
+    for node in nodes:
+        for direction in ('ingress', 'egress'):
+            if direction in node_metrics[node]:
+                samples.append(({'node': node, 'direction': direction}, node_metrics[node][direction]))
+    if samples:
+        metric('storj_node_bandwidth_bytes', 'gauge', 'Current month bandwidth of the node', samples)
+
+    return ('\n'.join(lines) + '\n').encode('utf-8')
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """Отдает готовый snapshot сервера на GET /metrics"""
+
+    def do_GET(self):
+        if self.path.split('?', 1)[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = self.server.snapshot
+        if body is None:
+            # Первый опрос еще не завершен: пустой ответ Prometheus принял бы за отсутствие метрик
+            self.send_error(503, 'Metrics are not ready yet')
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Не засоряем вывод строкой на каждый scrape
+        pass
+
+def start_metrics_server(host, port):
+    """Запускает HTTP сервер в фоновом потоке. Новый snapshot задается через server.snapshot
+
+    До первого snapshot (server.snapshot is None) сервер отвечает 503.
+    """
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    server.snapshot = None
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
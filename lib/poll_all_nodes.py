@@ -1,11 +1,17 @@
 #!/usr/bin/env python3
 """
-Асинхронный опрос всех нод и агрегация данных
+Асинхронный опрос всех нод (агрегация ответов - в aggregate.py)
 """
 import asyncio
 import aiohttp
 import json
+import time
 import config
+from circuit_breaker import (
+    load_circuit_state, save_circuit_state, is_circuit_open,
+    record_success, record_failure, get_down_since
+)
+from aggregate import SATELLITE_ROUTE, is_node_successful, count_route_results, aggregate_data
 
 def load_nodes(nodes_file):
     """Читает список нод из файла"""
@@ -21,62 +27,139 @@ def load_nodes(nodes_file):
         print(f"✗ Ошибка: файл {nodes_file} не найден")
         return []
 
-async def fetch_route(session, node, route, semaphore):
-    """Запрашивает один роут у одной ноды"""
+async def fetch_route(session, node, route, semaphore, timeout_seconds=None):
+    """Запрашивает один роут у одной ноды
+    
+    В результат добавляется elapsed - время запроса в секундах без ожидания семафора.
+    """
     url = f"http://{node}{route}"
     
+    if timeout_seconds is None:
+        timeout_seconds = config.REQUEST_TIMEOUT
+    
     async with semaphore:
-        try:
-            timeout = aiohttp.ClientTimeout(total=config.REQUEST_TIMEOUT)
-            async with session.get(url, timeout=timeout) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    return {
-                        'status': 'success',
-                        'status_code': response.status,
-                        'data': data
-                    }
-                else:
-                    return {
-                        'status': 'error',
-                        'status_code': response.status,
-                        'data': None
-                    }
-        except asyncio.TimeoutError:
-            return {
-                'status': 'error',
-                'error': 'timeout'
-            }
-        except aiohttp.ClientError as e:
-            return {
-                'status': 'error',
-                'error': str(e)
-            }
-        except Exception as e:
-            return {
-                'status': 'error',
-                'error': str(e)
-            }
+        started = time.monotonic()
+        result = await request_url(session, url, timeout_seconds)
+        result['elapsed'] = time.monotonic() - started
+        return result
 
-async def poll_node(session, node, routes, semaphore):
-    """Опрашивает одну ноду по всем роутам"""
-    results = {}
+async def request_url(session, url, timeout_seconds):
+    """Выполняет GET запрос и возвращает результат в формате ответа роута"""
+    try:
+        timeout = aiohttp.ClientTimeout(total=timeout_seconds)
+        async with session.get(url, timeout=timeout) as response:
+            if response.status == 200:
+                data = await response.json()
+                return {
+                    'status': 'success',
+                    'status_code': response.status,
+                    'data': data
+                }
+            else:
+                return {
+                    'status': 'error',
+                    'status_code': response.status,
+                    'data': None
+                }
+    except asyncio.TimeoutError:
+        return {
+            'status': 'error',
+            'error': 'timeout'
+        }
+    except aiohttp.ClientError as e:
+        return {
+            'status': 'error',
+            'error': str(e)
+        }
+    except Exception as e:
+        return {
+            'status': 'error',
+            'error': str(e)
+        }
+
+# Роут для проверки, что нода жива, если шаблону не нужны данные ни одного роута
+LIVENESS_ROUTE = '/api/sno'
+
+async def poll_node_satellites(session, node, sno_data, semaphore):
+    """Опрашивает все спутники одной ноды параллельно (в пределах общего семафора)"""
+    satellite_ids = [satellite['id'] for satellite in sno_data.get('satellites') or [] if satellite.get('id')]
+    routes = [f"{SATELLITE_ROUTE}/{satellite_id}" for satellite_id in satellite_ids]
+    results = await asyncio.gather(*(fetch_route(session, node, route, semaphore) for route in routes))
+    return dict(zip(routes, results))
+
+async def poll_node(session, node, routes, semaphore, per_satellite=False, known_results=None):
+    """Опрашивает одну ноду по всем роутам
+    
+    Args:
+        per_satellite: дополнительно опросить каждый спутник ноды. Запросы по спутникам
+            запускаются сразу после ответа /api/sno, параллельно с остальными роутами
+        known_results: уже полученные ответы (эти роуты повторно не запрашиваются)
+    """
+    results = dict(known_results or {})
+    satellites_task = None
     
     for route in routes:
-        result = await fetch_route(session, node, route, semaphore)
-        results[route] = result
+        if route not in results:
+            results[route] = await fetch_route(session, node, route, semaphore)
+        
+        route_result = results[route]
+        if per_satellite and route == '/api/sno' and route_result.get('status') == 'success':
+            satellites_task = asyncio.ensure_future(
+                poll_node_satellites(session, node, route_result.get('data') or {}, semaphore)
+            )
+    
+    if satellites_task is not None:
+        results.update(await satellites_task)
     
     return results
 
-async def poll_all_nodes(nodes_file='nodes.txt'):
-    """Опрашивает все ноды асинхронно и возвращает агрегированные данные"""
+async def probe_and_poll_node(session, node, routes, semaphore, probe_timeout, per_satellite=False):
+    """Проверяет "открытую" ноду одним быстрым запросом и опрашивает полностью, только если она ожила"""
+    if not routes:
+        return {}
+    
+    probe_route = routes[0]
+    probe_result = await fetch_route(session, node, probe_route, semaphore, timeout_seconds=probe_timeout)
+    if probe_result.get('status') != 'success':
+        return {probe_route: probe_result}
+    
+    return await poll_node(session, node, routes, semaphore, per_satellite=per_satellite,
+                           known_results={probe_route: probe_result})
+
+async def poll_all_nodes(nodes_file='nodes.txt', routes=None, per_satellite=False, on_node_result=None,
+                         circuit_state_file=None, persist_state=True):
+    """Опрашивает все ноды асинхронно и возвращает агрегированные данные
+    
+    Args:
+        nodes_file: путь к файлу со списком нод
+        routes: список роутов для опроса (если None, используется config.API_ROUTES)
+        per_satellite: опрашивать данные по каждому спутнику (нужен роут /api/sno)
+        on_node_result: callback(node, node_results, ok), вызывается сразу по готовности
+            каждой ноды; ok - нода успешно отдала все роуты
+        circuit_state_file: файл состояния circuit breaker (если None, config.CIRCUIT_STATE_FILE)
+        persist_state: сохранять состояние circuit breaker (False для dry-run)
+    """
     nodes = load_nodes(nodes_file)
     
     if not nodes:
         return None, {'total': 0, 'success': 0}
     
     total_nodes = len(nodes)
-    routes = config.API_ROUTES
+    if routes is None:
+        routes = config.API_ROUTES
+    if not routes:
+        # Без запросов все ноды считались бы ответившими, а мертвые - живыми
+        routes = [LIVENESS_ROUTE]
+    if per_satellite and '/api/sno' not in routes:
+        # Список спутников ноды берется из /api/sno
+        routes = ['/api/sno'] + list(routes)
+    
+    # Состояние circuit breaker: ноды, которые подряд не отвечают, проверяем только быстрым запросом
+    if circuit_state_file is None:
+        circuit_state_file = getattr(config, 'CIRCUIT_STATE_FILE', 'circuit_state.json')
+    failure_threshold = getattr(config, 'CIRCUIT_FAILURE_THRESHOLD', 3)
+    probe_timeout = getattr(config, 'CIRCUIT_PROBE_TIMEOUT', 3)
+    circuit_state = load_circuit_state(circuit_state_file)
     
     # Создаем семафор для ограничения одновременных запросов
     semaphore = asyncio.Semaphore(config.MAX_CONCURRENT_REQUESTS)
@@ -86,216 +169,106 @@ async def poll_all_nodes(nodes_file='nodes.txt'):
     async with aiohttp.ClientSession(timeout=timeout) as session:
         # Создаем задачи для всех нод с привязкой к имени ноды
         tasks = []
+        open_count = 0
         for node in nodes:
-            task = poll_node(session, node, routes, semaphore)
+            if is_circuit_open(circuit_state, node, failure_threshold):
+                task = probe_and_poll_node(session, node, routes, semaphore, probe_timeout, per_satellite)
+                open_count += 1
+            else:
+                task = poll_node(session, node, routes, semaphore, per_satellite)
             tasks.append((node, task))
         
-        # Ждем завершения всех задач параллельно
+        if open_count:
+            print(f"  {open_count} нод недоступны долгое время, проверяем их быстрым запросом")
+        
+        # Обрабатываем ноды по мере ответа, не дожидаясь самых медленных
         all_results = {}
         successful_nodes = {}
         failed_nodes = []
         
-        # Создаем задачи для asyncio.gather
-        task_coros = [task for _, task in tasks]
-        node_list = [node for node, _ in tasks]
+        # Время ответа каждой ноды (секунды, сумма по запросам без ожидания семафора),
+        # в том числе неудачных
+        latency = {}
+        poll_started = time.monotonic()
         
-        # Выполняем все задачи параллельно
-        results = await asyncio.gather(*task_coros, return_exceptions=True)
+        async def run_node_task(node, task):
+            try:
+                return node, await task
+            except Exception as e:
+                return node, e
         
-        # Обрабатываем результаты
         completed = 0
-        for i, result in enumerate(results):
-            node = node_list[i]
+        for next_result in asyncio.as_completed([run_node_task(node, task) for node, task in tasks]):
+            node, result = await next_result
             
             if isinstance(result, Exception):
                 all_results[node] = {}
+                failed_nodes.append(node)
+                record_failure(circuit_state, node)
                 print(f"  Ошибка при обработке {node}: {result}")
+                node_ok = False
             else:
                 node_results = result
                 all_results[node] = node_results
+                latency[node] = sum(route_result.get('elapsed', 0) for route_result in node_results.values())
                 
                 # Нода считается "ответившей", только если она успешно отдала ВСЕ роуты
-                all_routes_ok = True
-                for route in routes:
-                    route_result = node_results.get(route, {})
-                    if route_result.get('status') != 'success':
-                        all_routes_ok = False
-                        break
+                all_routes_ok = is_node_successful(node_results, routes)
 
                 if all_routes_ok:
                     successful_nodes[node] = node_results
+                    record_success(circuit_state, node)
                 else:
                     failed_nodes.append(node)
+                    record_failure(circuit_state, node)
+                node_ok = all_routes_ok
+            
+            if on_node_result is not None:
+                try:
+                    on_node_result(node, all_results[node], node_ok)
+                except Exception as e:
+                    print(f"  Ошибка в обработчике результата {node}: {e}")
             
             completed += 1
             if completed % 50 == 0:
                 print(f"  Обработано {completed} из {total_nodes} нод...")
         
+        # Возвращаем порядок нод из файла
+        node_order = {node: i for i, node in enumerate(nodes)}
+        failed_nodes.sort(key=node_order.get)
+        
+        if persist_state:
+            save_circuit_state(circuit_state_file, circuit_state)
+        
+        # Для открытых нод запоминаем, с какого момента они не отвечают
+        down_since = {}
+        for node in failed_nodes:
+            since = get_down_since(circuit_state, node, failure_threshold)
+            if since:
+                down_since[node] = since
+        
         # Подсчитываем статистику по роутам
-        route_stats = {}
-        for route in routes:
-            success_count = 0
-            for node_results in all_results.values():
-                if node_results.get(route, {}).get('status') == 'success':
-                    success_count += 1
-            route_stats[route] = success_count
+        route_stats = {route: 0 for route in routes}
+        failed_route_stats = {}
+        for node_results in all_results.values():
+            count_route_results(route_stats, failed_route_stats, node_results, routes)
         
         # Агрегируем данные только по полностью ответившим нодам
-        aggregated_data = aggregate_data(successful_nodes, routes)
+        aggregated_data = aggregate_data(successful_nodes, routes, per_satellite=per_satellite)
         
         stats = {
             'total': total_nodes,
             'success': len(successful_nodes),
             'failed_nodes': failed_nodes,
-            'by_route': route_stats
+            'down_since': down_since,
+            'by_route': route_stats,
+            'failed_by_route': failed_route_stats,
+            'latency': latency,
+            'duration': time.monotonic() - poll_started
         }
         
         return aggregated_data, stats
 
-def aggregate_data(successful_nodes, routes):
-    """Агрегирует данные от всех успешно ответивших нод"""
-    
-    # Инициализируем структуру для агрегированных данных
-    aggregated = {}
-    
-    for route in routes:
-        aggregated[route] = {
-            'status': 'success',
-            'status_code': 200,
-            'data': None
-        }
-    
-    # Агрегируем данные по каждому роуту
-    for route in routes:
-        route_data_list = []
-        
-        for node, node_results in successful_nodes.items():
-            route_result = node_results.get(route)
-            if route_result and route_result.get('status') == 'success':
-                route_data = route_result.get('data')
-                if route_data:
-                    route_data_list.append(route_data)
-        
-        if not route_data_list:
-            # Если нет успешных ответов по этому роуту, возвращаем None
-            aggregated[route]['data'] = None
-            continue
-        
-        # Агрегируем данные в зависимости от роута
-        if route == '/api/sno':
-            aggregated[route]['data'] = aggregate_sno_data(route_data_list)
-        elif route == '/api/sno/estimated-payout':
-            aggregated[route]['data'] = aggregate_payout_data(route_data_list)
-        elif route == '/api/sno/satellites':
-            aggregated[route]['data'] = aggregate_satellites_data(route_data_list)
-    
-    return aggregated
-
-def aggregate_sno_data(data_list):
-    """Агрегирует данные из /api/sno"""
-    aggregated = {
-        'diskSpace': {
-            'used': 0,
-            'trash': 0
-        }
-    }
-    
-    for data in data_list:
-        if 'diskSpace' in data:
-            disk_space = data['diskSpace']
-            if 'used' in disk_space:
-                aggregated['diskSpace']['used'] += disk_space['used']
-            if 'trash' in disk_space:
-                aggregated['diskSpace']['trash'] += disk_space['trash']
-    
-    return aggregated
-
-def aggregate_payout_data(data_list):
-    """Агрегирует данные из /api/sno/estimated-payout"""
-    aggregated = {
-        'currentMonth': {
-            'payout': 0,
-            'held': 0,
-            'diskSpacePayout': 0,
-            'egressBandwidthPayout': 0,
-            'egressRepairAuditPayout': 0
-        },
-        'currentMonthExpectations': 0
-    }
-    
-    for data in data_list:
-        if 'currentMonth' in data:
-            current_month = data['currentMonth']
-            if 'payout' in current_month:
-                aggregated['currentMonth']['payout'] += current_month['payout']
-            if 'held' in current_month:
-                aggregated['currentMonth']['held'] += current_month['held']
-            if 'diskSpacePayout' in current_month:
-                aggregated['currentMonth']['diskSpacePayout'] += current_month['diskSpacePayout']
-            if 'egressBandwidthPayout' in current_month:
-                aggregated['currentMonth']['egressBandwidthPayout'] += current_month['egressBandwidthPayout']
-            if 'egressRepairAuditPayout' in current_month:
-                aggregated['currentMonth']['egressRepairAuditPayout'] += current_month['egressRepairAuditPayout']
-        
-        if 'currentMonthExpectations' in data:
-            aggregated['currentMonthExpectations'] += data['currentMonthExpectations']
-    
-    return aggregated
-
-def aggregate_satellites_data(data_list):
-    """Агрегирует данные из /api/sno/satellites"""
-    aggregated = {
-        'ingressSummary': 0,
-        'egressSummary': 0,
-        'bandwidthDaily': []
-    }
-    
-    # Суммируем ingressSummary и egressSummary
-    for data in data_list:
-        if 'ingressSummary' in data:
-            aggregated['ingressSummary'] += data['ingressSummary']
-        if 'egressSummary' in data:
-            aggregated['egressSummary'] += data['egressSummary']
-    
-    # Суммируем ВСЕ дни из bandwidthDaily для получения данных за все время
-    all_time_aggregated = {
-        'ingress': {
-            'usage': 0,
-            'repair': 0
-        },
-        'egress': {
-            'usage': 0,
-            'repair': 0,
-            'audit': 0
-        }
-    }
-    
-    for data in data_list:
-        if 'bandwidthDaily' in data and isinstance(data['bandwidthDaily'], list):
-            bandwidth_daily = data['bandwidthDaily']
-            # Суммируем все дни, а не только последний
-            for day in bandwidth_daily:
-                if 'ingress' in day:
-                    ingress = day['ingress']
-                    if 'usage' in ingress:
-                        all_time_aggregated['ingress']['usage'] += ingress['usage']
-                    if 'repair' in ingress:
-                        all_time_aggregated['ingress']['repair'] += ingress['repair']
-                
-                if 'egress' in day:
-                    egress = day['egress']
-                    if 'usage' in egress:
-                        all_time_aggregated['egress']['usage'] += egress['usage']
-                    if 'repair' in egress:
-                        all_time_aggregated['egress']['repair'] += egress['repair']
-                    if 'audit' in egress:
-                        all_time_aggregated['egress']['audit'] += egress['audit']
-    
-    # Создаем один элемент bandwidthDaily с агрегированными данными за все время
-    aggregated['bandwidthDaily'] = [all_time_aggregated]
-    
-    return aggregated
-
 if __name__ == "__main__":
     print("Опрос всех нод...")
     aggregated_data, stats = asyncio.run(poll_all_nodes())
@@ -304,7 +277,8 @@ if __name__ == "__main__":
         print(f"✓ Опрос завершен: получен ответ от {stats['success']} из {stats['total']} нод")
         print(f"  Статистика по роутам:")
         for route, count in stats['by_route'].items():
-            print(f"    {route}: {count} нод")
+            failed = stats['failed_by_route'].get(route, 0)
+            print(f"    {route}: {count} нод" + (f" (ошибок: {failed})" if failed else ""))
         
         # Сохраняем для отладки (опционально)
         with open('aggregated_data.json', 'w', encoding='utf-8') as f:
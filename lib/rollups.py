@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Итоги заработка по месяцам и годам.
+
+Хранятся в JSON файле между запусками:
+    {"nodes": {"host:port": {"2024-05": {"payout": 123, "held": 45, ...}}},
+     "months": {"2024-05": {"payout": 1230, "held": 450, ...}},
+     "years": {"2024": {"payout": 5430, "held": 1200, ...}}}
+
+nodes - последний снимок estimated-payout каждой ноды за каждый месяц,
+months/years - суммы этих снимков по всем нодам. При новом снимке ноды к итогам
+месяца и года прибавляется только разница с прошлым снимком, поэтому отчет
+по периодам строится из готовых итогов без опроса истории нод.
+Все суммы - в центах. Месяцы считаются по UTC, как и в ответах нод.
+"""
+import json
+import os
+from datetime import datetime, timezone
+
+# Поля снимка, которые суммируются в итоги
+ROLLUP_FIELDS = ('payout', 'held', 'diskSpacePayout', 'egressBandwidthPayout', 'egressRepairAuditPayout')
+
+def load_rollups(rollup_file):
+    """Читает итоги из файла"""
+    store = {}
+    if os.path.exists(rollup_file):
+        try:
+            with open(rollup_file, 'r', encoding='utf-8') as f:
+                store = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"✗ Не удалось прочитать итоги {rollup_file}: {e}")
+    if not isinstance(store, dict):
+        store = {}
+    store.setdefault('nodes', {})
+    store.setdefault('months', {})
+    store.setdefault('years', {})
+    return store
+
+def save_rollups(rollup_file, store):
+    """Сохраняет итоги в файл"""
+    try:
+        with open(rollup_file, 'w', encoding='utf-8') as f:
+            json.dump(store, f, indent=2, ensure_ascii=False, sort_keys=True)
+        return True
+    except OSError as e:
+        print(f"✗ Не удалось сохранить итоги {rollup_file}: {e}")
+        return False
+
+def utc_today():
+    """Текущая дата по UTC: ноды считают месяцы currentMonth/previousMonth по UTC"""
+    return datetime.now(timezone.utc).date()
+
+def month_key(day):
+    """Ключ месяца: 2024-05"""
+    return f"{day.year:04d}-{day.month:02d}"
+
+def previous_month_key(day):
+    """Ключ предыдущего месяца"""
+    if day.month == 1:
+        return f"{day.year - 1:04d}-12"
+    return f"{day.year:04d}-{day.month - 1:02d}"
+
+def apply_node_snapshot(store, node, period, month_data):
+    """Заменяет снимок ноды за месяц и переносит разницу в итоги месяца и года
+
+    Returns:
+        int: прирост payout с прошлого снимка за этот месяц (центы)
+    """
+    snapshot = {field: month_data.get(field, 0) for field in ROLLUP_FIELDS}
+    node_periods = store['nodes'].setdefault(node, {})
+    previous = node_periods.get(period, {})
+
+    month_totals = store['months'].setdefault(period, {field: 0 for field in ROLLUP_FIELDS})
+    year_totals = store['years'].setdefault(period[:4], {field: 0 for field in ROLLUP_FIELDS})
+    for field in ROLLUP_FIELDS:
+        delta = snapshot[field] - previous.get(field, 0)
+        month_totals[field] = month_totals.get(field, 0) + delta
+        year_totals[field] = year_totals.get(field, 0) + delta
+
+    node_periods[period] = snapshot
+    return snapshot['payout'] - previous.get('payout', 0)
+
+def update_node_rollup(store, node, payout_data, today=None):
+    """Обновляет итоги по ответу /api/sno/estimated-payout одной ноды
+
+    previousMonth ноды закрывает прошлый месяц окончательными суммами,
+    даже если последний опрос в том месяце был до его конца.
+
+    Returns:
+        int: заработок ноды с прошлого опроса (центы) для дневной истории.
+        Для ноды без прошлых снимков прирост неизвестен и равен 0; в новом
+        месяце payout считается с нуля, поэтому прирост - весь payout.
+    """
+    if today is None:
+        today = utc_today()
+    if not payout_data:
+        return 0
+
+    node_periods = store['nodes'].get(node)
+    earnings = 0
+
+    if payout_data.get('currentMonth'):
+        earnings += apply_node_snapshot(store, node, month_key(today), payout_data['currentMonth'])
+    if payout_data.get('previousMonth'):
+        period = previous_month_key(today)
+        known = node_periods is not None and period in node_periods
+        delta = apply_node_snapshot(store, node, period, payout_data['previousMonth'])
+        if known:
+            earnings += delta
+
+    if node_periods is None:
+        return 0
+    return max(earnings, 0)
+
+def prune_rollups(store, today=None, keep_months=13):
+    """Удаляет старые снимки нод (итоги месяцев и лет остаются)"""
+    if today is None:
+        today = utc_today()
+    oldest_index = today.year * 12 + today.month - 1 - keep_months
+    oldest_key = f"{oldest_index // 12:04d}-{oldest_index % 12 + 1:02d}"
+    for node, node_periods in list(store['nodes'].items()):
+        for period in [key for key in node_periods if key < oldest_key]:
+            del node_periods[period]
+        if not node_periods:
+            del store['nodes'][node]
+    return store
+
+def build_period_report(store, today=None, months=12):
+    """Собирает отчет по периодам из готовых итогов
+
+    Returns:
+        dict: {'current_month': {...}, 'last_month': {...}, 'year': 2024,
+               'year_to_date': {...}, 'months': [('2024-05', {...}), ...]}
+        months - итоги за последние months месяцев (старые первыми), для трендов held
+    """
+    if today is None:
+        today = utc_today()
+    empty = {field: 0 for field in ROLLUP_FIELDS}
+
+    month_totals = store.get('months', {})
+    recent = []
+    for offset in range(months - 1, -1, -1):
+        index = today.year * 12 + today.month - 1 - offset
+        period = f"{index // 12:04d}-{index % 12 + 1:02d}"
+        recent.append((period, dict(month_totals.get(period, empty))))
+
+    return {
+        'current_month': dict(month_totals.get(month_key(today), empty)),
+        'last_month': dict(month_totals.get(previous_month_key(today), empty)),
+        'year': today.year,
+        'year_to_date': dict(store.get('years', {}).get(f"{today.year:04d}", empty)),
+        'months': recent
+    }
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Запись и воспроизведение сырых ответов нод (snapshot опроса).
+
+Формат файла - gzip с JSON по строке на запись:
+    {"meta": {"routes": [...], "per_satellite": false, "recorded_at": "..."}}
+    {"node": "host:port", "ok": true, "results": {"/api/sno": {...}, ...}}
+    ...
+
+Записи пишутся по мере ответа нод и читаются потоком, поэтому ни запись,
+ни воспроизведение не держат в памяти весь флот.
+"""
+import gzip
+import json
+from datetime import datetime
+
+from aggregate import is_node_successful, count_route_results, aggregate_data, merge_aggregated_data
+
+def open_snapshot(snapshot_file, routes, per_satellite=False):
+    """Открывает snapshot на запись и пишет заголовок с параметрами опроса"""
+    f = gzip.open(snapshot_file, 'wt', encoding='utf-8')
+    meta = {
+        'routes': list(routes),
+        'per_satellite': per_satellite,
+        'recorded_at': datetime.now().isoformat(timespec='seconds')
+    }
+    f.write(json.dumps({'meta': meta}, ensure_ascii=False) + '\n')
+    return f
+
+def write_node_record(f, node, node_results, ok):
+    """Дописывает в snapshot ответы одной ноды"""
+    record = {'node': node, 'ok': ok, 'results': node_results}
+    f.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n')
+
+def iter_snapshot(snapshot_file):
+    """Читает snapshot потоком: первым выдает meta (dict), затем записи нод"""
+    with gzip.open(snapshot_file, 'rt', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+def replay_snapshot(snapshot_file, chunk_size=500, on_node_result=None):
+    """Прогоняет snapshot через ту же агрегацию, что и живой опрос
+
+    Ноды агрегируются порциями по chunk_size, порции сразу сливаются
+    в общий результат, так что в памяти не больше одной порции.
+
+    Returns:
+        tuple: (aggregated_data, stats, meta)
+    """
+    records = iter_snapshot(snapshot_file)
+    first = next(records, None)
+    if not first or 'meta' not in first:
+        raise ValueError(f"{snapshot_file}: нет заголовка snapshot")
+
+    meta = first['meta']
+    routes = meta.get('routes') or []
+    per_satellite = meta.get('per_satellite', False)
+
+    aggregated = None
+    chunk = {}
+    total = 0
+    success = 0
+    failed_nodes = []
+    route_stats = {route: 0 for route in routes}
+    failed_route_stats = {}
+
+    def flush(chunk, aggregated):
+        chunk_aggregated = aggregate_data(chunk, routes, per_satellite=per_satellite)
+        if aggregated is None:
+            return chunk_aggregated
+        return merge_aggregated_data([aggregated, chunk_aggregated], routes, per_satellite=per_satellite)
+
+    for record in records:
+        node = record.get('node')
+        node_results = record.get('results') or {}
+        total += 1
+
+        count_route_results(route_stats, failed_route_stats, node_results, routes)
+
+        # Успешность считаем заново по тем же правилам, что и при опросе
+        ok = is_node_successful(node_results, routes)
+        if ok:
+            success += 1
+            chunk[node] = node_results
+            if len(chunk) >= chunk_size:
+                aggregated = flush(chunk, aggregated)
+                chunk = {}
+        else:
+            failed_nodes.append(node)
+
+        if on_node_result is not None:
+            on_node_result(node, node_results, ok)
+
+    if chunk or aggregated is None:
+        aggregated = flush(chunk, aggregated)
+
+    stats = {
+        'total': total,
+        'success': success,
+        'failed_nodes': failed_nodes,
+        'down_since': {},
+        'by_route': route_stats,
+        'failed_by_route': failed_route_stats
+    }
+    return aggregated, stats, meta
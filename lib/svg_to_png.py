@@ -6,7 +6,7 @@ import subprocess
 import sys
 import os
 
-def svg_to_png(svg_path, png_path=None, width=None, height=None):
+def svg_to_png(svg_path, png_path=None, width=None, height=None, zoom=None):
     """
     Конвертирует SVG файл в PNG используя rsvg-convert (более точная передача цветов)
     
@@ -15,6 +15,7 @@ def svg_to_png(svg_path, png_path=None, width=None, height=None):
         png_path: путь для сохранения PNG (если None, создается автоматически)
         width: ширина PNG в пикселях (если None, используется из SVG)
         height: высота PNG в пикселях (если None, используется из SVG)
+        zoom: масштаб относительно размеров из SVG (например, 2 для HiDPI)
     """
     if not os.path.exists(svg_path):
         print(f"Ошибка: файл {svg_path} не найден")
@@ -30,6 +31,8 @@ def svg_to_png(svg_path, png_path=None, width=None, height=None):
         # Если указаны размеры, добавляем их
         if width and height:
             cmd.extend(['--width', str(width), '--height', str(height)])
+        elif zoom and zoom != 1:
+            cmd.extend(['--zoom', str(zoom)])
         
         cmd.append(svg_path)
         
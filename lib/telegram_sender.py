@@ -5,32 +5,40 @@
 import requests
 import os
 
-def send_to_telegram(image_path, caption=None):
-    """Отправляет изображение в Telegram
-    
-    Args:
-        image_path: путь к изображению
-        caption: опциональный текст к картинке
-    """
+def load_telegram_settings():
+    """Читает chat_id и токен бота из config.py (или (None, None) с выводом ошибки)"""
     try:
         import config
     except ImportError:
         print("✗ Ошибка: config.py не найден")
-        return False
-    
-    if not os.path.exists(image_path):
-        print(f"✗ Ошибка: файл {image_path} не найден")
-        return False
+        return None, None
     
     chat_id = getattr(config, 'TELEGRAM_CHAT_ID', None)
     bot_token = getattr(config, 'TELEGRAM_BOT_TOKEN', None)
     
     if not chat_id or chat_id == "your_chat_id_here":
         print("✗ Ошибка: TELEGRAM_CHAT_ID не настроен в config.py")
-        return False
+        return None, None
     
     if not bot_token or bot_token == "your_bot_token_here":
         print("✗ Ошибка: TELEGRAM_BOT_TOKEN не настроен в config.py")
+        return None, None
+    
+    return chat_id, bot_token
+
+def send_to_telegram(image_path, caption=None):
+    """Отправляет изображение в Telegram
+    
+    Args:
+        image_path: путь к изображению
+        caption: опциональный текст к картинке
+    """
+    if not os.path.exists(image_path):
+        print(f"✗ Ошибка: файл {image_path} не найден")
+        return False
+    
+    chat_id, bot_token = load_telegram_settings()
+    if not chat_id or not bot_token:
         return False
     
     try:
@@ -54,3 +62,25 @@ def send_to_telegram(image_path, caption=None):
         # Не выводим детали ошибки, чтобы не палить токен или другую чувствительную информацию
         return False
 
+def send_message_to_telegram(text):
+    """Отправляет текстовое сообщение в Telegram
+    
+    Args:
+        text: текст сообщения (до 4096 символов)
+    """
+    chat_id, bot_token = load_telegram_settings()
+    if not chat_id or not bot_token:
+        return False
+    
+    try:
+        url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
+        response = requests.post(url, data={'chat_id': chat_id, 'text': text})
+        response.raise_for_status()
+        
+        print(f"✓ Сообщение успешно отправлено в Telegram")
+        return True
+        
+    except requests.exceptions.RequestException as e:
+        print(f"✗ Ошибка при отправке в Telegram")
+        # Не выводим детали ошибки, чтобы не палить токен или другую чувствительную информацию
+        return False
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Пакеты шаблонов карточки.
+
+Пакет - папка с SVG и manifest.json:
+    {
+      "name": "default",
+      "default_variant": "default",
+      "placeholders": ["strDateCurrent", ...],
+      "geometry": {"earnings_bar": {"x": 22, "width": 880}, ...},
+      "variants": {
+        "default": {"svg": "index.svg"},
+        "hidpi": {"svg": "index.svg", "scale": 2},
+        "compact": {"svg": "compact.svg", "geometry": {"earnings_bar": {"x": 16, "width": 444}}}
+      }
+    }
+
+geometry варианта дополняет geometry пакета, недостающее берется из DEFAULT_GEOMETRY.
+SVG каждого варианта компилируется один раз в список кусков (текст и имена
+плейсхолдеров), поэтому подстановка значений - это один join.
+"""
+import json
+import os
+import re
+
+# Плейсхолдеры шаблона имеют вид {{<тип><Секция><Поле>}}, например {{fltEarningsPaid}}
+PLACEHOLDER_PATTERN = re.compile(r'\{\{(\w+)\}\}')
+
+MANIFEST_FILE = 'manifest.json'
+
+# Геометрия шаблона templates/default/index.svg (используется, если в manifest ее нет)
+DEFAULT_GEOMETRY = {
+    'earnings_bar': {'x': 22, 'width': 880},
+    'storage_bar': {'x': 22, 'width': 880},
+    'bandwidth_bar': {'x': 189, 'width': 713},
+    'pie': {'radius': 66},
+    'chart': {'width': 212, 'height': 60},
+    'satellite_table': {'max_rows': 4, 'row_height': 26, 'columns': [22, 420, 540, 660, 760, 850, 906]},
+}
+
+# Кэш скомпилированных пакетов: путь → (mtime manifest и SVG вариантов, пакет)
+compiled_packs = {}
+
+def merge_geometry(*layers):
+    """Накладывает слои геометрии друг на друга (словари элементов сливаются по ключам)"""
+    merged = {}
+    for layer in layers:
+        for key, value in (layer or {}).items():
+            if isinstance(value, dict) and isinstance(merged.get(key), dict):
+                merged[key] = {**merged[key], **value}
+            else:
+                merged[key] = value
+    return merged
+
+def compile_svg(svg_content):
+    """Разбивает SVG на куски: четные - текст, нечетные - имена плейсхолдеров"""
+    return PLACEHOLDER_PATTERN.split(svg_content)
+
+def render_compiled(segments, values):
+    """Подставляет значения в скомпилированный SVG (неизвестные плейсхолдеры остаются как есть)"""
+    parts = list(segments)
+    for i in range(1, len(parts), 2):
+        name = parts[i]
+        parts[i] = values[name] if name in values else '{{' + name + '}}'
+    return ''.join(parts)
+
+def compile_variant(svg_file, geometry, scale=1):
+    """Читает и компилирует SVG одного варианта"""
+    with open(svg_file, 'r', encoding='utf-8') as f:
+        segments = compile_svg(f.read())
+    return {
+        'svg_file': svg_file,
+        'segments': segments,
+        'placeholders': set(segments[1::2]),
+        'geometry': geometry,
+        'scale': scale
+    }
+
+def get_pack_mtimes(manifest_file, svg_files):
+    """mtime manifest.json и SVG вариантов - ключ актуальности кэша пакета"""
+    return tuple(os.path.getmtime(path) for path in [manifest_file] + sorted(set(svg_files)))
+
+def load_template_pack(pack_dir):
+    """Загружает и компилирует пакет шаблонов (с кэшем до изменения manifest.json или SVG)"""
+    manifest_file = os.path.join(pack_dir, MANIFEST_FILE)
+    cached = compiled_packs.get(pack_dir)
+    if cached:
+        cached_svg_files = [variant['svg_file'] for variant in cached[1]['variants'].values()]
+        try:
+            if get_pack_mtimes(manifest_file, cached_svg_files) == cached[0]:
+                return cached[1]
+        except OSError:
+            # SVG варианта удален: пакет перечитывается заново
+            pass
+
+    with open(manifest_file, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    variants_config = manifest.get('variants') or {}
+    if not variants_config:
+        raise ValueError(f"{manifest_file}: не описано ни одного варианта")
+
+    pack_geometry = merge_geometry(DEFAULT_GEOMETRY, manifest.get('geometry'))
+    declared = set(manifest.get('placeholders') or [])
+
+    variants = {}
+    for name, variant in variants_config.items():
+        compiled = compile_variant(
+            os.path.join(pack_dir, variant['svg']),
+            merge_geometry(pack_geometry, variant.get('geometry')),
+            scale=variant.get('scale', 1)
+        )
+        undeclared = compiled['placeholders'] - declared if declared else set()
+        if undeclared:
+            raise ValueError(f"{manifest_file}: вариант {name} использует необъявленные плейсхолдеры: "
+                             f"{', '.join(sorted(undeclared))}")
+        variants[name] = compiled
+
+    pack = {
+        'name': manifest.get('name') or os.path.basename(os.path.normpath(pack_dir)),
+        'dir': pack_dir,
+        'default_variant': manifest.get('default_variant') or next(iter(variants)),
+        'variants': variants
+    }
+    svg_files = [variant['svg_file'] for variant in variants.values()]
+    compiled_packs[pack_dir] = (get_pack_mtimes(manifest_file, svg_files), pack)
+    return pack
+
+def load_single_svg_pack(svg_file):
+    """Пакет из одного SVG без manifest.json (геометрия по умолчанию)"""
+    return {
+        'name': os.path.splitext(os.path.basename(svg_file))[0],
+        'dir': os.path.dirname(svg_file),
+        'default_variant': 'default',
+        'variants': {'default': compile_variant(svg_file, merge_geometry(DEFAULT_GEOMETRY))}
+    }
+
+def resolve_template(template_path):
+    """Возвращает (пакет, вариант) для TEMPLATE_PATH
+
+    TEMPLATE_PATH может указывать на папку пакета или на SVG внутри нее
+    (тогда выбирается вариант с этим SVG). SVG вне пакета работает как раньше.
+    """
+    if os.path.isdir(template_path):
+        pack = load_template_pack(template_path)
+        return pack, pack['default_variant']
+
+    pack_dir = os.path.dirname(template_path)
+    if os.path.exists(os.path.join(pack_dir, MANIFEST_FILE)):
+        pack = load_template_pack(pack_dir)
+        svg_file = os.path.normpath(template_path)
+        default_variant = pack['variants'][pack['default_variant']]
+        if os.path.normpath(default_variant['svg_file']) == svg_file:
+            return pack, pack['default_variant']
+        for name, variant in pack['variants'].items():
+            if os.path.normpath(variant['svg_file']) == svg_file:
+                return pack, name
+
+    return load_single_svg_pack(template_path), 'default'
+
+def get_pack_placeholders(pack, variant_names):
+    """Объединение плейсхолдеров выбранных вариантов"""
+    placeholders = set()
+    for name in variant_names:
+        placeholders |= pack['variants'][name]['placeholders']
+    return placeholders
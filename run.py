@@ -1,26 +1,31 @@
 #!/usr/bin/env python3
 """
-Главный скрипт для генерации ежедневного отчета:
-1. Опрашивает все ноды асинхронно
-2. Агрегирует данные
-3. Генерирует SVG из шаблона
-4. Конвертирует SVG в PNG
-5. Отправляет в Telegram
+Главный скрипт для генерации ежедневного отчета.
+
+Подкоманды (без подкоманды выполняется report):
+    report  - полный цикл: опрос нод, алерты, SVG → PNG, отправка в Telegram
+    poll    - только опрос нод, результат сохраняется в JSON
+    render  - генерация PNG из сохраненного результата опроса
+    replay  - агрегация и генерация PNG из записанного snapshot (poll --record)
+    send    - отправка готового PNG в Telegram
+    serve   - долгоживущий режим с метриками Prometheus на /metrics
+    bench   - замер времени холодного старта подкоманд
+
+Каждая подкоманда импортирует только нужные ей модули: run.py часто
+вызывается из cron, и лишние импорты (aiohttp, requests) заметны.
 """
-import asyncio
+import argparse
 import os
-import uuid
-import tempfile
 import sys
+from datetime import datetime
 
 # Добавляем папку lib в путь для импорта модулей
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'lib'))
 
-import config
-from poll_all_nodes import poll_all_nodes
-from generate_from_svg import generate_svg_from_data
-from svg_to_png import svg_to_png
-from telegram_sender import send_to_telegram
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_POLL_RESULT_FILE = os.path.join(SCRIPT_DIR, 'poll_result.json')
+DEFAULT_CARD_FILE = os.path.join(SCRIPT_DIR, 'storj_card.png')
 
 def build_telegram_caption(stats):
     """Собирает caption для Telegram с учетом лимита 1024 символа."""
@@ -39,9 +44,17 @@ def build_telegram_caption(stats):
                 return left
         return s
 
+    def format_down_since(value):
+        # В состоянии circuit breaker время хранится в ISO формате
+        try:
+            return datetime.fromisoformat(value).strftime('%d.%m.%Y %H:%M')
+        except (TypeError, ValueError):
+            return str(value)
+
     success_count = stats.get('success', 0)
     total_count = stats.get('total', 0)
     failed_nodes = stats.get('failed_nodes', []) or []
+    down_since = stats.get('down_since', {}) or {}
 
     if success_count >= total_count:
         return None
@@ -52,7 +65,7 @@ def build_telegram_caption(stats):
     # Формат:
     # не получен ответ от X нод:
     # node101
-    # node202
+    # node202 (down since 05.01.2024 08:00)
     # ...
     failed_count = total_count - success_count
     header = f"не получен ответ от {failed_count} нод:"
@@ -64,6 +77,8 @@ def build_telegram_caption(stats):
 
     for node in failed_nodes:
         name = node_name_only(node)
+        if node in down_since:
+            name = f"{name} (down since {format_down_since(down_since[node])})"
         candidate_lines = lines + [name]
         candidate_caption = "\n".join(candidate_lines)
         if len(candidate_caption) > max_len:
@@ -80,64 +95,272 @@ def build_telegram_caption(stats):
 
     return "\n".join(lines)
 
-def main():
+def load_config():
+    """Импортирует config.py из папки проекта"""
     # Всегда работаем из папки проекта, чтобы относительные пути были стабильны
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    os.chdir(script_dir)
+    os.chdir(SCRIPT_DIR)
+    try:
+        import config
+    except ImportError:
+        print("✗ Ошибка: config.py не найден (скопируйте config.example.py)")
+        return None
+    return config
 
-    # Используем системную папку temp
-    temp_dir = tempfile.gettempdir()
+def save_poll_result(path, aggregated_data, stats):
+    """Сохраняет результат опроса в JSON"""
+    import json
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'data': aggregated_data, 'stats': stats}, f, indent=2, ensure_ascii=False)
 
-    # Генерируем UUID v4 для имен файлов
-    file_uuid = str(uuid.uuid4())
+def load_poll_result(path):
+    """Читает результат опроса из JSON: (aggregated_data, stats)"""
+    import json
+    with open(path, 'r', encoding='utf-8') as f:
+        result = json.load(f)
+    # Поддерживаем и "голые" агрегированные данные (как в aggregated_data.json)
+    if 'data' not in result:
+        return result, {}
+    return result.get('data'), result.get('stats') or {}
 
-    template_file = getattr(config, 'TEMPLATE_PATH', 'templates/default/index.svg')
+def load_card_template(config, args):
+    """Загружает пакет шаблонов и выбирает варианты для рендера. Возвращает (pack, variant_names)
+    
+    Варианты берутся из --variant, затем из TEMPLATE_VARIANTS, иначе - вариант TEMPLATE_PATH.
+    """
+    from template_pack import resolve_template
+    
+    template_file = args.template or getattr(config, 'TEMPLATE_PATH', 'templates/default/index.svg')
+    try:
+        pack, default_variant = resolve_template(template_file)
+    except (OSError, KeyError, ValueError) as e:
+        print(f"✗ Не удалось загрузить шаблон {template_file}: {e}")
+        return None, None
+    
+    variant_names = args.variant or getattr(config, 'TEMPLATE_VARIANTS', None) or [default_variant]
+    unknown = [name for name in variant_names if name not in pack['variants']]
+    if unknown:
+        print(f"✗ В пакете {pack['name']} нет вариантов: {', '.join(unknown)} "
+              f"(есть: {', '.join(pack['variants'])})")
+        return None, None
+    return pack, variant_names
+
+def get_template_routes(pack, variant_names):
+    """Роуты API, нужные выбранным вариантам пакета"""
+    from generate_from_svg import get_required_routes
+    from template_pack import get_pack_placeholders
+    return get_required_routes(get_pack_placeholders(pack, variant_names))
+
+def template_needs_per_satellite(config, pack, variant_names):
+    """Нужен ли опрос по каждому спутнику: по умолчанию - если в выбранных вариантах
+    есть плейсхолдеры секции Satellite, POLL_PER_SATELLITE = True/False включает/выключает явно"""
+    from generate_from_svg import get_template_sections
+    from template_pack import get_pack_placeholders
+    per_satellite = getattr(config, 'POLL_PER_SATELLITE', None)
+    if per_satellite is not None:
+        return bool(per_satellite)
+    return 'Satellite' in get_template_sections(get_pack_placeholders(pack, variant_names))
+
+def poll_nodes_for_template(config, pack, variant_names, poller, on_node_result=None, record_file=None,
+                            persist_state=True):
+    """Опрашивает ноды по роутам, нужным шаблону. Возвращает (aggregated_data, stats, routes)
+    
+    poller - модуль poll_all_nodes, который импортирует подкоманда.
+    Если задан record_file, сырые ответы нод пишутся в snapshot по мере ответа.
+    При persist_state=False состояние circuit breaker не сохраняется (dry-run).
+    """
+    import asyncio
+    
     nodes_file = getattr(config, 'NODES_FILE', 'nodes.txt')
-    output_svg = os.path.join(temp_dir, f"{file_uuid}.svg")
-    output_png = os.path.join(temp_dir, f"{file_uuid}.png")
+    
+    # Определяем по плейсхолдерам шаблона, какие роуты нужно опрашивать
+    routes = get_template_routes(pack, variant_names)
+    
+    print(f"  Роуты для шаблона: {', '.join(routes) if routes else 'нет'}")
+    per_satellite = template_needs_per_satellite(config, pack, variant_names)
+    if per_satellite:
+        print("  Включен опрос по каждому спутнику")
+        if '/api/sno' not in routes:
+            # Список спутников ноды берется из /api/sno
+            routes = ['/api/sno'] + routes
+    
+    # Шаблону не нужны данные нод: опрашиваем один роут, чтобы знать, какие ноды живы
+    poll_routes = routes or [poller.LIVENESS_ROUTE]
+    if not routes:
+        print(f"  Проверка доступности нод по {poller.LIVENESS_ROUTE}")
+    
+    snapshot = None
+    if record_file:
+        from snapshot import open_snapshot, write_node_record
+        snapshot = open_snapshot(record_file, poll_routes, per_satellite)
+    
+    def handle_node_result(node, node_results, ok):
+        if snapshot is not None:
+            write_node_record(snapshot, node, node_results, ok)
+        if on_node_result is not None:
+            on_node_result(node, node_results, ok)
+    
+    try:
+        aggregated_data, stats = asyncio.run(
+            poller.poll_all_nodes(nodes_file=nodes_file, routes=poll_routes, per_satellite=per_satellite,
+                                  on_node_result=handle_node_result, persist_state=persist_state)
+        )
+    finally:
+        if snapshot is not None:
+            snapshot.close()
+            print(f"  Ответы нод записаны в {record_file}")
+    
+    if aggregated_data is None:
+        print("✗ Не удалось получить данные от нод")
+        return None, None, routes
+    
+    print(f"✓ Опрос завершен: получен ответ от {stats['success']} из {stats['total']} нод")
+    return aggregated_data, stats, routes
+
+def get_variant_png(output_png, variant_names, name):
+    """Путь к PNG варианта: первый вариант пишется в output_png, остальные - рядом с суффиксом"""
+    if name == variant_names[0]:
+        return output_png
+    base, ext = os.path.splitext(output_png)
+    return f"{base}-{name}{ext or '.png'}"
+
+def render_card(config, aggregated_data, stats, pack, variant_names, output_png, series, periods,
+                generate_svg_variants, svg_to_png):
+    """Генерирует SVG выбранных вариантов пакета и конвертирует в PNG
+    
+    Функции рендера передает подкоманда, которая их импортирует.
+    
+    Returns:
+        list: пути к PNG в порядке variant_names или None при ошибке
+    """
+    import tempfile
+    import uuid
+    
+    # SVG - промежуточные файлы в системной папке temp
+    output_svgs = {name: os.path.join(tempfile.gettempdir(), f"{uuid.uuid4()}.svg") for name in variant_names}
+    
+    print(f"\n2. Генерация SVG из шаблона {pack['name']} ({', '.join(variant_names)})...")
+    try:
+        generate_svg_variants(aggregated_data, pack, variant_names, output_svgs, stats=stats, series=series,
+                              periods=periods)
+        for name in variant_names:
+            print(f"✓ SVG {name} сохранен: {output_svgs[name]}")
+    except Exception as e:
+        print(f"✗ Ошибка при генерации SVG: {e}")
+        return None
+    
+    print(f"\n3. Конвертация SVG в PNG...")
+    png_files = []
+    for name in variant_names:
+        png_file = get_variant_png(output_png, variant_names, name)
+        if not svg_to_png(output_svgs[name], png_file, zoom=pack['variants'][name]['scale']):
+            print("✗ Не удалось сгенерировать PNG")
+            return None
+        png_files.append(png_file)
+    
+    return png_files
+
+def cmd_report(args):
+    """Полный цикл: опрос, алерты, карточка, отправка"""
+    import tempfile
+    import uuid
+    import poll_all_nodes
+    from generate_from_svg import get_missing_routes, generate_svg_variants
+    from svg_to_png import svg_to_png
+    from history import load_history, save_history, update_history, build_fleet_series
+    from rollups import load_rollups, save_rollups, update_node_rollup, prune_rollups, build_period_report
+    from telegram_sender import send_to_telegram, send_message_to_telegram
+    from alerts import (
+        DEFAULT_ALERT_RULES, compile_rules, load_alert_state, save_alert_state,
+        evaluate_node, collect_new_alerts, build_alert_message
+    )
+    if args.import_only:
+        return True
+    
+    config = load_config()
+    if config is None:
+        return False
+    
+    pack, variant_names = load_card_template(config, args)
+    if pack is None:
+        return False
+    output_png = os.path.join(tempfile.gettempdir(), f"{uuid.uuid4()}.png")
     
     print("=" * 60)
     print("Генерация ежедневного отчета Storj")
     print("=" * 60)
     
+    # Правила алертов компилируются один раз и проверяются на каждой ноде по мере ответа
+    try:
+        alert_rules = compile_rules(getattr(config, 'ALERT_RULES', DEFAULT_ALERT_RULES))
+    except (TypeError, ValueError) as e:
+        print(f"✗ Ошибка в ALERT_RULES: {e}")
+        return False
+    alert_state_file = getattr(config, 'ALERT_STATE_FILE', 'alert_state.json')
+    alert_state = load_alert_state(alert_state_file)
+    fired_alerts = {}
+    evaluated_nodes = set()
+    
+    # Итоги по месяцам и годам обновляются снимком каждой ответившей ноды
+    rollup_file = getattr(config, 'ROLLUP_FILE', 'rollups.json')
+    rollups = load_rollups(rollup_file)
+    
+    # Заработок за день - сумма приростов payout ответивших нод
+    earnings = 0
+    
+    def on_node_result(node, node_results, ok):
+        nonlocal earnings
+        if ok and alert_rules:
+            evaluate_node(alert_rules, alert_state, node, node_results, fired_alerts)
+            evaluated_nodes.add(node)
+        if ok:
+            payout_data = node_results.get('/api/sno/estimated-payout', {}).get('data')
+            earnings += update_node_rollup(rollups, node, payout_data)
+    
     # Шаг 1: Опрос всех нод
     print("\n1. Опрос всех нод...")
-    aggregated_data, stats = asyncio.run(poll_all_nodes(nodes_file=nodes_file))
-    
-    if not aggregated_data:
-        print("✗ Не удалось получить данные от нод")
+    aggregated_data, stats, routes = poll_nodes_for_template(config, pack, variant_names, poll_all_nodes,
+                                                             on_node_result, record_file=args.record,
+                                                             persist_state=not args.dry_run)
+    if aggregated_data is None:
         return False
     
-    success_count = stats['success']
-    total_count = stats['total']
-    
-    print(f"✓ Опрос завершен: получен ответ от {success_count} из {total_count} нод")
+    # Алерты отправляем отдельным сообщением, не дожидаясь генерации карточки.
+    # Если отправить не удалось, состояние не сохраняем, чтобы повторить в следующий раз
+    new_alerts = collect_new_alerts(alert_state, fired_alerts, evaluated_nodes)
+    alert_message = build_alert_message(new_alerts)
+    if alert_message:
+        print(f"  Новых алертов: {len(new_alerts)}")
+        if args.dry_run:
+            print(alert_message)
+        elif send_message_to_telegram(alert_message):
+            save_alert_state(alert_state_file, alert_state)
+    elif not args.dry_run:
+        save_alert_state(alert_state_file, alert_state)
     
     # Проверяем, что есть данные для генерации карточки
-    sno_data = aggregated_data.get('/api/sno', {}).get('data')
-    payout_data = aggregated_data.get('/api/sno/estimated-payout', {}).get('data')
-    satellites_data = aggregated_data.get('/api/sno/satellites', {}).get('data')
-    
-    if not sno_data or not payout_data or not satellites_data:
+    missing_routes = get_missing_routes(aggregated_data, routes)
+    if missing_routes:
         print("✗ Недостаточно данных для генерации карточки")
-        print(f"  /api/sno: {'✓' if sno_data else '✗'}")
-        print(f"  /api/sno/estimated-payout: {'✓' if payout_data else '✗'}")
-        print(f"  /api/sno/satellites: {'✓' if satellites_data else '✗'}")
+        for route in routes:
+            print(f"  {route}: {'✗' if route in missing_routes else '✓'}")
         return False
     
-    # Шаг 2: Генерация SVG
-    print(f"\n2. Генерация SVG из шаблона {template_file}...")
-    try:
-        generate_svg_from_data(aggregated_data, template_file, output_svg, stats=stats)
-        print(f"✓ SVG сохранен: {output_svg}")
-    except Exception as e:
-        print(f"✗ Ошибка при генерации SVG: {e}")
-        return False
+    # Пополняем историю по дням и строим ряды для графиков
+    history_file = getattr(config, 'HISTORY_FILE', 'history.json')
+    history = update_history(load_history(history_file), aggregated_data, earnings)
+    if not args.dry_run:
+        save_history(history_file, history)
+    series = build_fleet_series(history, days=getattr(config, 'CHART_DAYS', 30))
     
-    # Шаг 3: Конвертация SVG в PNG
-    print(f"\n3. Конвертация SVG в PNG...")
-    if not svg_to_png(output_svg, output_png):
-        print("✗ Не удалось сгенерировать PNG")
+    prune_rollups(rollups)
+    if not args.dry_run:
+        save_rollups(rollup_file, rollups)
+    periods = build_period_report(rollups)
+    
+    # Шаги 2-3: SVG → PNG
+    png_files = render_card(config, aggregated_data, stats, pack, variant_names, output_png, series, periods,
+                            generate_svg_variants, svg_to_png)
+    if not png_files:
         return False
     
     # Шаг 4: Отправка в Telegram
@@ -146,9 +369,17 @@ def main():
     # Формируем текст к картинке, если не все ноды ответили
     caption = build_telegram_caption(stats)
     
-    if not send_to_telegram(output_png, caption):
-        print("✗ Не удалось отправить в Telegram")
-        return False
+    if args.dry_run:
+        print(f"  dry-run: PNG сохранен в {', '.join(png_files)}, отправка пропущена")
+        if caption:
+            print(caption)
+        return True
+    
+    # Подпись - только у первой картинки
+    for i, png_file in enumerate(png_files):
+        if not send_to_telegram(png_file, caption if i == 0 else None):
+            print("✗ Не удалось отправить в Telegram")
+            return False
     
     print("\n" + "=" * 60)
     print("✓ Отчет успешно сгенерирован и отправлен!")
@@ -156,7 +387,328 @@ def main():
     
     return True
 
+def cmd_poll(args):
+    """Опрос нод с сохранением результата в JSON"""
+    import poll_all_nodes
+    if args.import_only:
+        return True
+    
+    config = load_config()
+    if config is None:
+        return False
+    
+    pack, variant_names = load_card_template(config, args)
+    if pack is None:
+        return False
+    
+    print("Опрос всех нод...")
+    aggregated_data, stats, _ = poll_nodes_for_template(config, pack, variant_names, poll_all_nodes,
+                                                        record_file=args.record)
+    if aggregated_data is None:
+        return False
+    
+    save_poll_result(args.output, aggregated_data, stats)
+    print(f"  Результат сохранен в {args.output}")
+    return True
+
+def cmd_render(args):
+    """Генерация PNG из сохраненного результата опроса (без опроса нод)"""
+    from history import load_history, build_fleet_series
+    from rollups import load_rollups, build_period_report
+    from generate_from_svg import generate_svg_variants
+    from svg_to_png import svg_to_png
+    if args.import_only:
+        return True
+    
+    config = load_config()
+    if config is None:
+        return False
+    
+    pack, variant_names = load_card_template(config, args)
+    if pack is None:
+        return False
+    
+    try:
+        aggregated_data, stats = load_poll_result(args.input)
+    except (OSError, ValueError) as e:
+        print(f"✗ Не удалось прочитать результат опроса {args.input}: {e}")
+        return False
+    
+    # История и итоги только читаются: пополняет их report
+    history = load_history(getattr(config, 'HISTORY_FILE', 'history.json'))
+    series = build_fleet_series(history, days=getattr(config, 'CHART_DAYS', 30))
+    periods = build_period_report(load_rollups(getattr(config, 'ROLLUP_FILE', 'rollups.json')))
+    
+    png_files = render_card(config, aggregated_data, stats, pack, variant_names, args.output, series, periods,
+                            generate_svg_variants, svg_to_png)
+    if not png_files:
+        return False
+    
+    print(f"✓ PNG сохранен: {', '.join(png_files)}")
+    return True
+
+def cmd_replay(args):
+    """Агрегация и генерация PNG из snapshot без опроса нод"""
+    import time
+    from history import load_history, build_fleet_series
+    from rollups import load_rollups, build_period_report
+    from generate_from_svg import get_missing_routes, generate_svg_variants
+    from snapshot import replay_snapshot
+    from svg_to_png import svg_to_png
+    if args.import_only:
+        return True
+    
+    # Аргумент необязателен только для bench (--import-only), здесь он нужен
+    if not args.snapshot:
+        print("✗ Не указан snapshot (./run.py replay snapshot.jsonl.gz)")
+        return False
+    
+    config = load_config()
+    if config is None:
+        return False
+    
+    pack, variant_names = load_card_template(config, args)
+    if pack is None:
+        return False
+    
+    print(f"Воспроизведение snapshot {args.snapshot}...")
+    started = time.perf_counter()
+    try:
+        aggregated_data, stats, meta = replay_snapshot(args.snapshot, chunk_size=args.chunk_size)
+    except (OSError, ValueError) as e:
+        print(f"✗ Не удалось прочитать snapshot {args.snapshot}: {e}")
+        return False
+    aggregate_seconds = time.perf_counter() - started
+    
+    print(f"✓ Snapshot от {meta.get('recorded_at')}: ответ от {stats['success']} из {stats['total']} нод")
+    print(f"  Агрегация: {aggregate_seconds * 1000:.1f} ms")
+    
+    if args.json:
+        save_poll_result(args.json, aggregated_data, stats)
+        print(f"  Результат сохранен в {args.json}")
+    
+    routes = get_template_routes(pack, variant_names)
+    missing_routes = get_missing_routes(aggregated_data, routes)
+    if missing_routes:
+        print("✗ В snapshot недостаточно данных для шаблона")
+        for route in routes:
+            print(f"  {route}: {'✗' if route in missing_routes else '✓'}")
+        return False
+    
+    history = load_history(getattr(config, 'HISTORY_FILE', 'history.json'))
+    series = build_fleet_series(history, days=getattr(config, 'CHART_DAYS', 30))
+    periods = build_period_report(load_rollups(getattr(config, 'ROLLUP_FILE', 'rollups.json')))
+    
+    started = time.perf_counter()
+    png_files = render_card(config, aggregated_data, stats, pack, variant_names, args.output, series, periods,
+                            generate_svg_variants, svg_to_png)
+    if not png_files:
+        return False
+    print(f"✓ PNG сохранен: {', '.join(png_files)} (рендер {(time.perf_counter() - started) * 1000:.1f} ms)")
+    return True
+
+def cmd_send(args):
+    """Отправка готового PNG в Telegram"""
+    from telegram_sender import send_to_telegram
+    if args.import_only:
+        return True
+    
+    if load_config() is None:
+        return False
+    
+    caption = None
+    if args.poll_result:
+        try:
+            _, stats = load_poll_result(args.poll_result)
+        except (OSError, ValueError) as e:
+            print(f"✗ Не удалось прочитать результат опроса {args.poll_result}: {e}")
+            return False
+        caption = build_telegram_caption(stats)
+    
+    return send_to_telegram(args.png, caption)
+
+def cmd_serve(args):
+    """Долгоживущий режим: периодически опрашивает ноды и отдает метрики Prometheus"""
+    import asyncio
+    import time
+    from poll_all_nodes import poll_all_nodes
+    from metrics_exporter import METRICS_ROUTES, start_metrics_server, extract_node_metrics, build_metrics_snapshot
+    if args.import_only:
+        return True
+    
+    config = load_config()
+    if config is None:
+        return False
+    
+    nodes_file = getattr(config, 'NODES_FILE', 'nodes.txt')
+    host = getattr(config, 'METRICS_HOST', '0.0.0.0')
+    port = getattr(config, 'METRICS_PORT', 9651)
+    interval = getattr(config, 'METRICS_POLL_INTERVAL', 300)
+    # Свое состояние circuit breaker: частые опросы serve не должны открывать цепи для report
+    circuit_state_file = getattr(config, 'METRICS_CIRCUIT_STATE_FILE', 'circuit_state_serve.json')
+    
+    try:
+        server = start_metrics_server(host, port)
+    except OSError as e:
+        print(f"✗ Не удалось запустить сервер метрик на {host}:{port}: {e}")
+        return False
+    print(f"✓ Метрики доступны на http://{host}:{port}/metrics (опрос раз в {interval} с)")
+    
+    try:
+        while True:
+            node_metrics = {}
+            
+            def on_node_result(node, node_results, ok):
+                node_metrics[node] = extract_node_metrics(node_results, ok)
+            
+            try:
+                aggregated_data, stats = asyncio.run(
+                    poll_all_nodes(nodes_file=nodes_file, routes=METRICS_ROUTES, on_node_result=on_node_result,
+                                   circuit_state_file=circuit_state_file)
+                )
+                # Scrape всегда отдает последний готовый snapshot, опрос его только подменяет
+                server.snapshot = build_metrics_snapshot(aggregated_data, stats, node_metrics)
+                print(f"✓ Опрос завершен: получен ответ от {stats.get('success', 0)} из {stats.get('total', 0)} нод")
+            except Exception as e:
+                # Неудачный опрос не останавливает сервер: остается прошлый snapshot
+                print(f"✗ Ошибка опроса нод: {e}")
+            
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        return True
+    finally:
+        server.shutdown()
+
+def cmd_bench(args):
+    """Замеряет время холодного старта подкоманд и дописывает результат в историю замеров"""
+    import json
+    import platform
+    import statistics
+    import subprocess
+    import time
+    
+    commands = args.commands or ['report', 'poll', 'render', 'replay', 'send', 'serve']
+    
+    # Каждый запуск - новый процесс: run.py импортирует модули подкоманды и сразу выходит
+    results = {}
+    for command in commands:
+        timings = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            completed = subprocess.run(
+                [sys.executable, os.path.join(SCRIPT_DIR, 'run.py'), command, '--import-only'],
+                capture_output=True, text=True
+            )
+            elapsed = time.perf_counter() - started
+            if completed.returncode != 0:
+                print(f"✗ {command}: ошибка запуска")
+                if completed.stderr:
+                    print(f"Детали: {completed.stderr.strip().splitlines()[-1]}")
+                break
+            timings.append(elapsed * 1000)
+        if timings:
+            results[command] = {'median_ms': round(statistics.median(timings), 1),
+                                'min_ms': round(min(timings), 1)}
+    
+    # Сравниваем с прошлым замером из истории
+    history_file = args.history
+    previous = {}
+    if os.path.exists(history_file):
+        with open(history_file, 'r', encoding='utf-8') as f:
+            lines = [line for line in f if line.strip()]
+        if lines:
+            try:
+                previous = json.loads(lines[-1]).get('results', {})
+            except ValueError:
+                previous = {}
+    
+    print(f"Холодный старт run.py ({args.repeat} запусков, медиана):")
+    for command, timing in results.items():
+        line = f"  {command:<8} {timing['median_ms']:>8.1f} ms"
+        if command in previous:
+            line += f"  (было {previous[command]['median_ms']:.1f} ms)"
+        print(line)
+    
+    if results:
+        record = {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'repeat': args.repeat,
+            'results': results
+        }
+        with open(history_file, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        print(f"  Результат дописан в {args.history}")
+    
+    return bool(results)
+
+def build_parser():
+    """Собирает парсер аргументов командной строки"""
+    # --import-only нужен только bench: подкоманда импортирует свои модули и выходит
+    # Пути из аргументов сразу делаются абсолютными: load_config() меняет текущую папку на папку проекта
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--import-only', action='store_true', help=argparse.SUPPRESS)
+    
+    parser = argparse.ArgumentParser(description="Ежедневный отчет Storj")
+    parser.set_defaults(handler=cmd_report, import_only=False, dry_run=False, template=None, variant=None,
+                        record=None)
+    subparsers = parser.add_subparsers(dest='command')
+    
+    report = subparsers.add_parser('report', parents=[common], help="полный цикл (по умолчанию)")
+    report.add_argument('--template', type=os.path.abspath, help="шаблон SVG или папка пакета шаблонов (по умолчанию TEMPLATE_PATH)")
+    report.add_argument('--variant', action='append',
+                        help="вариант пакета шаблонов (можно несколько, по умолчанию TEMPLATE_VARIANTS)")
+    report.add_argument('--dry-run', action='store_true',
+                        help="ничего не отправлять в Telegram и не сохранять состояние")
+    report.add_argument('--record', type=os.path.abspath, help="записать сырые ответы нод в snapshot (.jsonl.gz)")
+    report.set_defaults(handler=cmd_report)
+    
+    poll = subparsers.add_parser('poll', parents=[common], help="опрос нод с сохранением в JSON")
+    poll.add_argument('--template', type=os.path.abspath, help="шаблон, по которому выбираются роуты")
+    poll.add_argument('--variant', action='append',
+                      help="вариант пакета шаблонов (можно несколько, по умолчанию TEMPLATE_VARIANTS)")
+    poll.add_argument('-o', '--output', type=os.path.abspath, default=DEFAULT_POLL_RESULT_FILE, help="куда сохранить результат")
+    poll.add_argument('--record', type=os.path.abspath, help="записать сырые ответы нод в snapshot (.jsonl.gz)")
+    poll.set_defaults(handler=cmd_poll)
+    
+    render = subparsers.add_parser('render', parents=[common], help="PNG из сохраненного результата опроса")
+    render.add_argument('-i', '--input', type=os.path.abspath, default=DEFAULT_POLL_RESULT_FILE, help="результат опроса (JSON)")
+    render.add_argument('-o', '--output', type=os.path.abspath, default=DEFAULT_CARD_FILE, help="куда сохранить PNG")
+    render.add_argument('--template', type=os.path.abspath, help="шаблон SVG или папка пакета шаблонов (по умолчанию TEMPLATE_PATH)")
+    render.add_argument('--variant', action='append',
+                        help="вариант пакета шаблонов (можно несколько, по умолчанию TEMPLATE_VARIANTS)")
+    render.set_defaults(handler=cmd_render)
+    
+    replay = subparsers.add_parser('replay', parents=[common], help="PNG из записанного snapshot")
+    replay.add_argument('snapshot', nargs='?', type=os.path.abspath, help="snapshot, записанный poll --record")
+    replay.add_argument('-o', '--output', type=os.path.abspath, default=DEFAULT_CARD_FILE, help="куда сохранить PNG")
+    replay.add_argument('--template', type=os.path.abspath, help="шаблон SVG или папка пакета шаблонов (по умолчанию TEMPLATE_PATH)")
+    replay.add_argument('--variant', action='append',
+                        help="вариант пакета шаблонов (можно несколько, по умолчанию TEMPLATE_VARIANTS)")
+    replay.add_argument('--json', type=os.path.abspath, help="сохранить агрегированный результат в JSON")
+    replay.add_argument('--chunk-size', type=int, default=500, help="сколько нод агрегировать за раз")
+    replay.set_defaults(handler=cmd_replay)
+    
+    send = subparsers.add_parser('send', parents=[common], help="отправка готового PNG в Telegram")
+    send.add_argument('png', nargs='?', type=os.path.abspath, default=DEFAULT_CARD_FILE, help="путь к PNG")
+    send.add_argument('--poll-result', type=os.path.abspath, help="результат опроса (JSON) для подписи о неответивших нодах")
+    send.set_defaults(handler=cmd_send)
+    
+    serve = subparsers.add_parser('serve', parents=[common], help="метрики Prometheus на /metrics")
+    serve.set_defaults(handler=cmd_serve)
+    
+    bench = subparsers.add_parser('bench', help="замер времени холодного старта подкоманд")
+    bench.add_argument('commands', nargs='*', help="подкоманды для замера (по умолчанию все)")
+    bench.add_argument('-n', '--repeat', type=int, default=5, help="число запусков каждой подкоманды")
+    bench.add_argument('--history', type=os.path.abspath, default=os.path.join(SCRIPT_DIR, 'bench_history.jsonl'), help="файл истории замеров")
+    bench.set_defaults(handler=cmd_bench)
+    
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
+
 if __name__ == "__main__":
     success = main()
     exit(0 if success else 1)
-